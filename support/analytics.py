@@ -0,0 +1,181 @@
+import datetime
+import logging
+import time
+from typing import Optional
+
+import discord
+from redbot.core import commands
+
+from .records import Ticket
+
+log = logging.getLogger("red.vrt.support.analytics")
+
+# Upper bound in seconds of each histogram bucket for reply and close times
+BUCKETS = [60, 300, 900, 1800, 3600, 7200, 14400, 43200, 86400, 259200, 604800]
+BUCKET_NAMES = ["1m", "5m", "15m", "30m", "1h", "2h", "4h", "12h", "1d", "3d", "1w"]
+# Per-day rollups older than this get dropped
+DAYS_KEPT = 90
+
+
+def new_stats() -> dict:
+    return {
+        "opened": 0,
+        "closed": 0,
+        # Tickets opened per hour of the day
+        "hours": [0] * 24,
+        # Histograms have one extra bucket for anything longer than the last bound
+        "reply_times": [0] * (len(BUCKETS) + 1),
+        "close_times": [0] * (len(BUCKETS) + 1),
+        # Date -> [opened, closed]
+        "days": {},
+    }
+
+
+def stats_error(stats: dict) -> Optional[str]:
+    """Check stats from outside the bot, like an import, have the shape new_stats() does"""
+    shape = new_stats()
+    for key, value in stats.items():
+        if key not in shape:
+            return f"unknown stats key {key}"
+        if key in ["opened", "closed"]:
+            if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                return f"stats {key} should be a whole number of 0 or more"
+        elif key == "days":
+            if not isinstance(value, dict):
+                return "stats days should be an object"
+            for day, counts in value.items():
+                try:
+                    datetime.date.fromisoformat(day)
+                except ValueError:
+                    return f"stats day {day} is not a date"
+                if not isinstance(counts, list) or len(counts) != 2 or not all(
+                        isinstance(i, int) and not isinstance(i, bool) for i in counts
+                ):
+                    return f"stats day {day} should be [opened, closed]"
+        elif not isinstance(value, list) or len(value) != len(shape[key]) or not all(
+                isinstance(i, int) and not isinstance(i, bool) for i in value
+        ):
+            return f"stats {key} should be a list of {len(shape[key])} numbers"
+    return None
+
+
+def bucket_index(seconds: float) -> int:
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(BUCKETS)
+
+
+# Approximate median from a histogram, the answer is the bucket the middle value falls in
+def histogram_median(hist: list) -> str:
+    total = sum(hist)
+    if not total:
+        return "N/A"
+    running = 0
+    for i, count in enumerate(hist):
+        running += count
+        if running * 2 >= total:
+            if i == len(BUCKETS):
+                return f"Over {BUCKET_NAMES[-1]}"
+            return f"Under {BUCKET_NAMES[i]}"
+
+
+class AnalyticsMixin(commands.Cog):
+    async def get_stats(self, guild: discord.Guild) -> dict:
+        stats = self.stats.get(guild.id)
+        if stats is not None:
+            return stats
+        stats = new_stats()
+        stats.update(await self.config.guild(guild).stats())
+        self.stats[guild.id] = stats
+        return stats
+
+    # Bump the rollup for today, dropping old days when a new one starts
+    async def bump_day(self, guild: discord.Guild, stats: dict, index: int):
+        today = datetime.date.today()
+        key = today.isoformat()
+        days = stats["days"]
+        if key not in days:
+            days[key] = [0, 0]
+            cutoff = (today - datetime.timedelta(days=DAYS_KEPT)).isoformat()
+            for day in [d for d in days if d < cutoff]:
+                del days[day]
+                await self.config.guild(guild).stats.clear_raw("days", day)
+        days[key][index] += 1
+        await self.config.guild(guild).stats.set_raw("days", key, value=days[key])
+
+    async def record_open(self, guild: discord.Guild, ticket: Ticket):
+        stats = await self.get_stats(guild)
+        stats["opened"] += 1
+        stats["hours"][datetime.datetime.fromtimestamp(ticket.opened).hour] += 1
+        group = self.config.guild(guild).stats
+        await group.set_raw("opened", value=stats["opened"])
+        await group.set_raw("hours", value=stats["hours"])
+        await self.bump_day(guild, stats, 0)
+
+    async def record_close(self, guild: discord.Guild, ticket: Ticket):
+        stats = await self.get_stats(guild)
+        stats["closed"] += 1
+        stats["close_times"][bucket_index(time.time() - ticket.opened)] += 1
+        group = self.config.guild(guild).stats
+        await group.set_raw("closed", value=stats["closed"])
+        await group.set_raw("close_times", value=stats["close_times"])
+        await self.bump_day(guild, stats, 1)
+
+    async def record_reply(self, guild: discord.Guild, ticket: Ticket):
+        stats = await self.get_stats(guild)
+        stats["reply_times"][bucket_index(time.time() - ticket.opened)] += 1
+        await self.config.guild(guild).stats.set_raw("reply_times", value=stats["reply_times"])
+
+    # Look for the first message from support staff in a ticket
+    @commands.Cog.listener("on_message")
+    async def analytics_message(self, message: discord.Message):
+        if not message.guild or message.author.bot:
+            return
+        # Only check tickets that are already loaded, no config reads for every message
+        ticket = self.tickets.get(message.guild.id, {}).get(message.channel.id)
+        if not ticket or ticket.replied or message.author.id == ticket.owner_id:
+            return
+        resolved = self.resolved.get(message.guild.id)
+        if not resolved:
+            conf = await self.config.guild(message.guild).all()
+            resolved = self.get_resolved(message.guild, conf)
+        roles = getattr(message.author, "roles", [])
+        if not any(role in roles for role in resolved.support_roles):
+            return
+        ticket.replied = 1
+        await self.update_ticket(message.guild, ticket)
+        await self.record_reply(message.guild, ticket)
+
+    async def analytics_embed(self, guild: discord.Guild) -> discord.Embed:
+        stats = await self.get_stats(guild)
+        tickets = await self.get_tickets(guild)
+        days = stats["days"]
+        today = datetime.date.today()
+        week = [(today - datetime.timedelta(days=i)).isoformat() for i in range(7)]
+        week_opened = sum(days[d][0] for d in week if d in days)
+        per_day = round(sum(d[0] for d in days.values()) / len(days), 1) if days else 0
+        desc = f"`Total Opened:       `{stats['opened']}\n" \
+               f"`Total Closed:       `{stats['closed']}\n" \
+               f"`Currently Open:     `{len(tickets)}\n" \
+               f"`Opened (7 days):    `{week_opened}\n" \
+               f"`Average Per Day:    `{per_day}\n" \
+               f"`Median First Reply: `{histogram_median(stats['reply_times'])}\n" \
+               f"`Median Time Open:   `{histogram_median(stats['close_times'])}\n"
+        embed = discord.Embed(
+            title="Support Analytics",
+            description=desc,
+            color=discord.Colour.dark_theme()
+        )
+        recent = ""
+        for day in week:
+            opened, closed = days.get(day, [0, 0])
+            recent += f"`{day}: `{opened} opened, {closed} closed\n"
+        embed.add_field(name="Last 7 Days", value=recent, inline=False)
+        hours = stats["hours"]
+        if any(hours):
+            busiest = sorted(range(24), key=lambda h: hours[h], reverse=True)[:3]
+            value = "\n".join(f"`{h:02d}:00-{h:02d}:59: `{hours[h]} tickets" for h in busiest)
+            embed.add_field(name="Busiest Hours", value=value, inline=False)
+        embed.set_footer(text=f"Rollups are kept for {DAYS_KEPT} days")
+        return embed
@@ -0,0 +1,146 @@
+import heapq
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+import discord
+from redbot.core import commands
+from redbot.core.utils.mod import is_admin_or_superior
+
+from .records import Ticket
+from .resolved import CAN_READ
+
+log = logging.getLogger("red.vrt.support.assign")
+
+
+class StaffQueue:
+    """
+    Min-heap of support staff keyed by how many open tickets they are assigned
+
+    Loads change by pushing a new entry, old entries are skipped when they come off the heap
+    """
+
+    def __init__(self):
+        self.loads: Dict[int, int] = {}
+        self.heap: List[Tuple[int, int]] = []
+        # Members with a support role, built once and then kept up to date by member events
+        self.staff: Dict[int, discord.Member] = {}
+        # Support roles the staff set was built from, None until it has been built
+        self.role_ids: Optional[Set[int]] = None
+
+    def set_load(self, member_id: int, load: int):
+        self.loads[member_id] = load
+        heapq.heappush(self.heap, (load, member_id))
+        # Rebuild once stale entries start to pile up
+        if len(self.heap) > 4 * len(self.loads) + 32:
+            self.heap = [(count, mid) for mid, count in self.loads.items()]
+            heapq.heapify(self.heap)
+
+    def adjust(self, member_id: int, amount: int):
+        self.set_load(member_id, max(self.loads.get(member_id, 0) + amount, 0))
+
+    # Least loaded member that passes the check
+    def pick(self, check) -> Optional[int]:
+        skipped = []
+        picked = None
+        while self.heap:
+            load, member_id = heapq.heappop(self.heap)
+            if self.loads.get(member_id) != load:
+                continue
+            skipped.append((load, member_id))
+            if check(member_id):
+                picked = member_id
+                break
+        for entry in skipped:
+            heapq.heappush(self.heap, entry)
+        return picked
+
+
+class AssignMixin(commands.Cog):
+    async def get_staff_queue(self, guild: discord.Guild) -> StaffQueue:
+        queue = self.staff_queues.get(guild.id)
+        if queue:
+            return queue
+        queue = StaffQueue()
+        for ticket in (await self.get_tickets(guild)).values():
+            if ticket.assigned:
+                queue.loads[ticket.assigned] = queue.loads.get(ticket.assigned, 0) + 1
+        for member_id, load in queue.loads.items():
+            heapq.heappush(queue.heap, (load, member_id))
+        self.staff_queues[guild.id] = queue
+        return queue
+
+    # Pick the least loaded online support member for a new ticket, everything comes from cache
+    async def pick_staff(self, guild: discord.Guild, support_roles: list) -> Optional[discord.Member]:
+        queue = await self.get_staff_queue(guild)
+        role_ids = {role.id for role in support_roles}
+        # Only scan the member list when the support roles change
+        if queue.role_ids != role_ids:
+            queue.staff = {}
+            for role in support_roles:
+                for member in role.members:
+                    if not member.bot:
+                        queue.staff[member.id] = member
+            queue.role_ids = role_ids
+            for member_id in queue.staff:
+                if member_id not in queue.loads:
+                    queue.set_load(member_id, 0)
+        staff = queue.staff
+
+        def check(member_id: int):
+            member = staff.get(member_id)
+            return member is not None and member.status != discord.Status.offline
+
+        member_id = queue.pick(check)
+        return staff.get(member_id) if member_id else None
+
+    @commands.Cog.listener("on_member_update")
+    async def staff_member_update(self, before: discord.Member, after: discord.Member):
+        queue = self.staff_queues.get(after.guild.id)
+        if not queue or queue.role_ids is None or before.roles == after.roles or after.bot:
+            return
+        if any(role.id in queue.role_ids for role in after.roles):
+            queue.staff[after.id] = after
+            if after.id not in queue.loads:
+                queue.set_load(after.id, 0)
+        else:
+            queue.staff.pop(after.id, None)
+
+    @commands.Cog.listener("on_member_remove")
+    async def staff_member_remove(self, member: discord.Member):
+        queue = self.staff_queues.get(member.guild.id)
+        if queue:
+            queue.staff.pop(member.id, None)
+
+    async def assign_ticket(self, guild: discord.Guild, ticket: Ticket, member: discord.Member):
+        queue = await self.get_staff_queue(guild)
+        if ticket.assigned:
+            queue.adjust(ticket.assigned, -1)
+        queue.adjust(member.id, 1)
+        ticket.assigned = member.id
+
+    async def unassign_ticket(self, guild: discord.Guild, ticket: Ticket):
+        queue = self.staff_queues.get(guild.id)
+        if queue and ticket.assigned:
+            queue.adjust(ticket.assigned, -1)
+
+    @commands.command(name="sreassign")
+    @commands.guild_only()
+    async def reassign_ticket(self, ctx: commands.Context, *, member: discord.Member):
+        """Assign this ticket to a different support member"""
+        guild = ctx.guild
+        conf = await self.config.guild(guild).all()
+        ticket = await self.get_ticket(guild, ctx.channel.id)
+        if not ticket:
+            return await ctx.send("This is not a ticket channel, or it has been removed from config")
+        resolved = self.get_resolved(guild, conf)
+        is_staff = any(role in ctx.author.roles for role in resolved.support_roles)
+        if not is_staff and not await is_admin_or_superior(self.bot, ctx.author):
+            return await ctx.send("You do not have permissions to reassign this ticket")
+        if not any(role in member.roles for role in resolved.support_roles):
+            return await ctx.send(f"{member.name} does not have a support role")
+        if ticket.assigned == member.id:
+            return await ctx.send(f"This ticket is already assigned to {member.name}")
+        await ctx.channel.set_permissions(member, overwrite=CAN_READ)
+        await self.assign_ticket(guild, ticket, member)
+        await self.update_ticket(guild, ticket)
+        await ctx.send(f"This ticket has been assigned to {member.mention}")
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import sqlite3
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+import discord
+from redbot.core import commands
+from redbot.core.data_manager import cog_data_path
+
+log = logging.getLogger("red.vrt.support.backend")
+
+
+class TicketBackend(ABC):
+    """
+    Ticket state that has to stay consistent when more than one process handles tickets
+
+    Every method is atomic, so two processes can never hand out the same ticket number
+    or let a user past their ticket limit
+    """
+    name = "base"
+
+    @abstractmethod
+    async def next_number(self, guild_id: int, start: int) -> int:
+        """Allocate the next ticket number, seeding the sequence with `start` the first time"""
+
+    @abstractmethod
+    async def reset_number(self, guild_id: int):
+        """Forget a guild's sequence so the next allocation seeds it again"""
+
+    @abstractmethod
+    async def try_open(self, guild_id: int, user_id: int, limit: int) -> bool:
+        """Claim an open ticket slot for a user if they are under the limit"""
+
+    @abstractmethod
+    async def release(self, guild_id: int, user_id: int):
+        """Give back an open ticket slot"""
+
+    @abstractmethod
+    async def sync_counts(self, guild_id: int, counts: Dict[int, int]):
+        """Make sure a guild's open ticket counts cover the tickets this process knows about"""
+
+    async def close(self):
+        pass
+
+
+class MemoryBackend(TicketBackend):
+    """Single process backend, nothing awaits in between reads and writes so every call is atomic"""
+    name = "memory"
+
+    def __init__(self):
+        self.numbers: Dict[int, int] = {}
+        self.counts: Dict[int, Dict[int, int]] = {}
+
+    async def next_number(self, guild_id: int, start: int) -> int:
+        num = self.numbers.get(guild_id, start)
+        self.numbers[guild_id] = num + 1
+        return num
+
+    async def reset_number(self, guild_id: int):
+        self.numbers.pop(guild_id, None)
+
+    async def try_open(self, guild_id: int, user_id: int, limit: int) -> bool:
+        counts = self.counts.setdefault(guild_id, {})
+        if counts.get(user_id, 0) >= limit:
+            return False
+        counts[user_id] = counts.get(user_id, 0) + 1
+        return True
+
+    async def release(self, guild_id: int, user_id: int):
+        counts = self.counts.get(guild_id, {})
+        if counts.get(user_id, 0) > 1:
+            counts[user_id] -= 1
+        else:
+            counts.pop(user_id, None)
+
+    # Slots claimed by tickets still being created aren't in config yet, so only ever raise counts here
+    # and let them come back down through release
+    async def sync_counts(self, guild_id: int, counts: Dict[int, int]):
+        current = self.counts.setdefault(guild_id, {})
+        for user_id, count in counts.items():
+            current[user_id] = max(current.get(user_id, 0), count)
+
+
+class SQLiteBackend(TicketBackend):
+    """
+    Backend for several processes on the same machine sharing one SQLite database in WAL mode
+
+    Writes use BEGIN IMMEDIATE so the read and the write happen under the same database lock
+    """
+    name = "sqlite"
+
+    def __init__(self, path: Path):
+        self.path = path
+        # sqlite connections are not thread safe, so everything runs on one worker thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="support-sqlite")
+        self.conn: Optional[sqlite3.Connection] = None
+
+    async def run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def connect(self) -> sqlite3.Connection:
+        if self.conn:
+            return self.conn
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sequences (guild_id INTEGER PRIMARY KEY, num INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS open_counts ("
+            "guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL, count INTEGER NOT NULL, "
+            "PRIMARY KEY (guild_id, user_id))"
+        )
+        self.conn = conn
+        return conn
+
+    def transaction(self, func, *args):
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(conn, *args)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    @staticmethod
+    def _next_number(conn: sqlite3.Connection, guild_id: int, start: int) -> int:
+        conn.execute("INSERT OR IGNORE INTO sequences VALUES (?, ?)", (guild_id, start))
+        conn.execute("UPDATE sequences SET num = num + 1 WHERE guild_id = ?", (guild_id,))
+        row = conn.execute("SELECT num FROM sequences WHERE guild_id = ?", (guild_id,)).fetchone()
+        return row[0] - 1
+
+    @staticmethod
+    def _reset_number(conn: sqlite3.Connection, guild_id: int):
+        conn.execute("DELETE FROM sequences WHERE guild_id = ?", (guild_id,))
+
+    @staticmethod
+    def _try_open(conn: sqlite3.Connection, guild_id: int, user_id: int, limit: int) -> bool:
+        conn.execute("INSERT OR IGNORE INTO open_counts VALUES (?, ?, 0)", (guild_id, user_id))
+        cursor = conn.execute(
+            "UPDATE open_counts SET count = count + 1 WHERE guild_id = ? AND user_id = ? AND count < ?",
+            (guild_id, user_id, limit)
+        )
+        return cursor.rowcount == 1
+
+    @staticmethod
+    def _release(conn: sqlite3.Connection, guild_id: int, user_id: int):
+        conn.execute(
+            "UPDATE open_counts SET count = count - 1 WHERE guild_id = ? AND user_id = ? AND count > 0",
+            (guild_id, user_id)
+        )
+        conn.execute("DELETE FROM open_counts WHERE guild_id = ? AND user_id = ? AND count = 0", (guild_id, user_id))
+
+    # Other processes may hold slots this one can't see, so counts are only ever raised here
+    # and only come back down through release
+    @staticmethod
+    def _sync_counts(conn: sqlite3.Connection, guild_id: int, counts: Dict[int, int]):
+        conn.executemany(
+            "INSERT INTO open_counts VALUES (?, ?, ?) "
+            "ON CONFLICT (guild_id, user_id) DO UPDATE SET count = MAX(count, excluded.count)",
+            [(guild_id, uid, count) for uid, count in counts.items()]
+        )
+
+    async def next_number(self, guild_id: int, start: int) -> int:
+        return await self.run(self.transaction, self._next_number, guild_id, start)
+
+    async def reset_number(self, guild_id: int):
+        await self.run(self.transaction, self._reset_number, guild_id)
+
+    async def try_open(self, guild_id: int, user_id: int, limit: int) -> bool:
+        return await self.run(self.transaction, self._try_open, guild_id, user_id, limit)
+
+    async def release(self, guild_id: int, user_id: int):
+        await self.run(self.transaction, self._release, guild_id, user_id)
+
+    async def sync_counts(self, guild_id: int, counts: Dict[int, int]):
+        await self.run(self.transaction, self._sync_counts, guild_id, counts)
+
+    def _close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    async def close(self):
+        await self.run(self._close)
+        self.executor.shutdown(wait=False)
+
+
+class BackendMixin(commands.Cog):
+    async def get_backend(self) -> TicketBackend:
+        if self.backend:
+            return self.backend
+        async with self.backend_lock:
+            if self.backend:
+                return self.backend
+            kind = await self.config.backend()
+            if kind == "sqlite":
+                path = await self.config.backend_path()
+                path = Path(path) if path else cog_data_path(self) / "tickets.db"
+                backend = SQLiteBackend(path)
+            else:
+                backend = MemoryBackend()
+            self.backend = backend
+        log.info(f"Using {backend.name} ticket state backend")
+        # Bring the new backend up to date with every guild we have tickets loaded for
+        for guild_id in list(self.tickets):
+            guild = self.bot.get_guild(guild_id)
+            if guild:
+                await self.sync_open_counts(guild)
+        return backend
+
+    # Bring the backend's open ticket counts in line with the ticket records
+    async def sync_open_counts(self, guild: discord.Guild):
+        counts = {}
+        for ticket in self.tickets.get(guild.id, {}).values():
+            counts[ticket.owner_id] = counts.get(ticket.owner_id, 0) + 1
+        backend = await self.get_backend()
+        await backend.sync_counts(guild.id, counts)
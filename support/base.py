@@ -1,12 +1,15 @@
 import datetime
 import logging
 from io import StringIO
+from typing import Union
 
 import discord
 from redbot.core import commands
 from redbot.core.utils.mod import is_admin_or_superior
 from redbot.core.i18n import Translator
 
+from .records import Ticket
+
 LOADING = ""
 log = logging.getLogger("red.vrt.support.base")
 _ = Translator("Support", __file__)
@@ -19,10 +22,10 @@ class BaseCommands(commands.Cog):
         guild = ctx.guild
         chan = ctx.channel
         conf = await self.config.guild(guild).all()
-        opened = conf["opened"]
-        owner_id = self.get_ticket_owner(opened, str(chan.id))
-        if not owner_id:
+        ticket = await self.get_ticket(guild, chan.id)
+        if not ticket:
             return await ctx.send("This is not a ticket channel, or it has been removed from config")
+        owner_id = str(ticket.owner_id)
         if owner_id == str(ctx.author.id) and not conf["user_can_manage"] and ctx.author.id != guild.owner_id:
             return await ctx.send("You do not have permissions to add users to your ticket")
         # If a mod tries
@@ -47,10 +50,10 @@ class BaseCommands(commands.Cog):
         guild = ctx.guild
         chan = ctx.channel
         conf = await self.config.guild(guild).all()
-        opened = conf["opened"]
-        owner_id = self.get_ticket_owner(opened, str(chan.id))
-        if not owner_id:
+        ticket = await self.get_ticket(guild, chan.id)
+        if not ticket:
             return await ctx.send("This is not a ticket channel, or it has been removed from config")
+        owner_id = str(ticket.owner_id)
         if owner_id == str(ctx.author.id) and not conf["user_can_rename"] and ctx.author.id != guild.owner_id:
             return await ctx.send("You do not have permissions to rename your ticket")
         can_rename = False
@@ -76,12 +79,11 @@ class BaseCommands(commands.Cog):
         chan = ctx.channel
         conf = await self.config.guild(guild).all()
         dm = conf["dm"]
-        log_chan = conf["log"]
-        opened = conf["opened"]
         transcript = conf["transcript"]
-        owner_id = self.get_ticket_owner(opened, str(chan.id))
-        if not owner_id:
+        ticket = await self.get_ticket(guild, chan.id)
+        if not ticket:
             return await ctx.send("This is not a ticket channel, or it has been removed from config")
+        owner_id = str(ticket.owner_id)
         if owner_id == str(user.id) and not conf["user_can_close"] and user.id != guild.owner_id:
             return await ctx.send("Users are not allowed to close their own tickets currently")
         can_close = False
@@ -96,19 +98,39 @@ class BaseCommands(commands.Cog):
             can_close = True
         if not can_close:
             return await ctx.send("You do not have permissions to close this ticket")
-        else:
-            owner = guild.get_member(int(owner_id))
-            if not owner:
-                owner = await self.bot.fetch_user(int(owner_id))
-
-        ticket = opened[owner_id][str(chan.id)]
-        pfp = ticket["pfp"]
+        owner = guild.get_member(int(owner_id))
+        if not owner:
+            owner = await self.bot.fetch_user(int(owner_id))
+        # If transcript is enabled, let them know it may take a moment
+        if transcript:
+            tr = discord.Embed(
+                description="Archiving channel...",
+                color=discord.Colour.dark_theme()
+            )
+            tr.set_footer(text="This channel will be deleted once complete")
+            tr.set_thumbnail(url=LOADING)
+            await ctx.send(embed=tr)
+        await self.close_ticket_channel(guild, conf, owner, ticket, user.name, reason, dm=dm)
+
+    # Close pipeline shared by sclose, auto-close and bulk closing
+    async def close_ticket_channel(
+            self,
+            guild: discord.Guild,
+            conf: dict,
+            owner: Union[discord.Member, discord.User],
+            ticket: Ticket,
+            closed_by: str,
+            reason: str = None,
+            dm: bool = False
+    ):
+        owner_id = str(owner.id)
+        chan = guild.get_channel(ticket.channel_id)
+        pfp = owner.avatar_url
 
         now = datetime.datetime.now()
         now = now.astimezone()
 
-        opened = datetime.datetime.fromisoformat(ticket["opened"])
-        opened = opened.astimezone()
+        opened = ticket.opened_at
 
         opened = opened.strftime('%m/%d/%y at %I:%M %p %Z')
         closed = now.strftime('%m/%d/%y at %I:%M %p %Z')
@@ -118,39 +140,32 @@ class BaseCommands(commands.Cog):
             description=f"Ticket created by **{owner.name}-{owner_id}** has been closed.\n"
                         f"`Opened on: `{opened}\n"
                         f"`Closed on: `{closed}\n"
-                        f"`Closed by: `{ctx.author.name}\n"
+                        f"`Closed by: `{closed_by}\n"
                         f"`Reason:    `{reason}\n",
             color=discord.Colour.dark_theme()
         )
         embed.set_thumbnail(url=pfp)
-        async with self.config.guild(ctx.guild).opened() as tickets:
-            del tickets[owner_id][str(chan.id)]
-        if log_chan:
-            log_chan = guild.get_channel(log_chan)
+        if await self.remove_ticket(guild, ticket.channel_id):
+            backend = await self.get_backend()
+            await backend.release(guild.id, ticket.owner_id)
+            await self.record_close(guild, ticket)
+            await self.unassign_ticket(guild, ticket)
+        log_chan = self.get_resolved(guild, conf).log_channel
         # If transcript is enabled, gather messages before sending to log
-        if transcript:
-            tr = discord.Embed(
-                description="Archiving channel...",
-                color=discord.Colour.dark_theme()
-            )
-            tr.set_footer(text="This channel will be deleted once complete")
-            tr.set_thumbnail(url=LOADING)
-            await ctx.send(embed=tr)
-            history = await self.fetch_channel_history(chan)
-            history.reverse()
+        if conf["transcript"] and chan:
             filename = f"{owner.name}-{owner_id}.txt"
             filename = filename.replace("/", "")
             if log_chan:
-                text = ""
-                for msg in history:
+                # Messages are redacted one at a time as they stream in from history
+                redactor = await self.get_redactor(guild, conf)
+                iofile = StringIO()
+                async for msg in chan.history(limit=None, oldest_first=True):
                     if msg.author.id == self.bot.user.id:
                         continue
-                    if not msg:
-                        continue
                     if not msg.content:
                         continue
-                    text += f"{msg.author.name}: {msg.content}\n"
-                iofile = StringIO(text)
+                    iofile.write(f"{msg.author.name}: {self.redact(redactor, msg.content)}\n")
+                iofile.seek(0)
                 file = discord.File(iofile, filename=filename)
                 await log_chan.send(embed=embed, file=file)
 
@@ -160,44 +175,26 @@ class BaseCommands(commands.Cog):
                 log.warning(f"Failed to delete ticket channel: {e}")
         # Otherwise just delete the channel and send to log
         else:
-            try:
-                await chan.delete()
-            except Exception as e:
-                log.warning(f"Failed to delete ticket channel: {e}")
+            if chan:
+                try:
+                    await chan.delete()
+                except Exception as e:
+                    log.warning(f"Failed to delete ticket channel: {e}")
             if log_chan:
                 await log_chan.send(embed=embed)
 
         # If DM is on, also send log to ticket owner
-        if dm and owner:
+        if dm:
             try:
                 await owner.send(embed=embed)
-            except discord.Forbidden:  # Bot is either blocked or user has left
+            except discord.HTTPException:  # Bot is either blocked or user has left
                 pass
 
         # Delete old log message
-        if log_chan:
-            log_msg_id = ticket["logmsg"]
+        if log_chan and ticket.logmsg:
             try:
-                log_msg = await log_chan.fetch_message(log_msg_id)
+                await log_chan.get_partial_message(ticket.logmsg).delete()
             except discord.NotFound:
                 log.warning("Failed to get log channel message")
-                log_msg = None
-            if log_msg:
-                try:
-                    await log_msg.delete()
-                except Exception as e:
-                    log.warning(f"Failed to delete log message: {e}")
-
-    @staticmethod
-    async def fetch_channel_history(channel: discord.TextChannel):
-        history = []
-        async for msg in channel.history():
-            history.append(msg)
-        return history
-
-    @staticmethod
-    def get_ticket_owner(opened: dict, channel_id: str):
-        for uid, tickets in opened.items():
-            for cid in tickets:
-                if cid == channel_id:
-                    return uid
+            except Exception as e:
+                log.warning(f"Failed to delete log message: {e}")
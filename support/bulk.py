@@ -0,0 +1,222 @@
+import asyncio
+import datetime
+import logging
+from typing import Optional
+
+import discord
+from redbot.core import commands
+from redbot.core.utils.chat_formatting import pagify
+from redbot.core.utils.menus import menu, DEFAULT_CONTROLS
+
+from .records import Ticket
+
+log = logging.getLogger("red.vrt.support.bulk")
+
+# How many tickets get closed at the same time
+BULK_CONCURRENCY = 3
+# Seconds between progress embed edits
+PROGRESS_INTERVAL = 5
+
+
+class DryRun(commands.Converter):
+    async def convert(self, ctx: commands.Context, argument: str) -> bool:
+        if argument.lower() in ["dry", "--dry", "dryrun", "--dry-run", "preview"]:
+            return True
+        raise commands.BadArgument("Not a dry run flag")
+
+
+class BulkCommands(commands.Cog):
+    @commands.group(name="supportbulk", aliases=["sbulk"])
+    @commands.guild_only()
+    @commands.admin()
+    async def bulk(self, ctx: commands.Context):
+        """
+        Close tickets in bulk
+
+        Tickets go through the same close process as `sclose`, so transcripts and logs are kept.
+        Put `dry` before the reason to see which tickets would be closed without closing anything.
+
+        Bulk closes pick back up where they left off if the bot restarts.
+        """
+        pass
+
+    @bulk.command(name="age")
+    async def bulk_close_age(
+            self,
+            ctx: commands.Context,
+            days: int,
+            dry_run: Optional[DryRun] = False,
+            *,
+            reason: str = None
+    ):
+        """Close all tickets that have been open longer than a number of days"""
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+
+        def check(ticket: Ticket):
+            return ticket.opened < cutoff.timestamp()
+
+        await self.start_bulk_close(ctx, check, dry_run, reason)
+
+    @bulk.command(name="owner")
+    async def bulk_close_owner(
+            self,
+            ctx: commands.Context,
+            user: discord.User,
+            dry_run: Optional[DryRun] = False,
+            *,
+            reason: str = None
+    ):
+        """Close all tickets opened by a user"""
+        def check(ticket: Ticket):
+            return ticket.owner_id == user.id
+
+        await self.start_bulk_close(ctx, check, dry_run, reason)
+
+    @bulk.command(name="category")
+    async def bulk_close_category(
+            self,
+            ctx: commands.Context,
+            category: discord.CategoryChannel,
+            dry_run: Optional[DryRun] = False,
+            *,
+            reason: str = None
+    ):
+        """Close all tickets in a category"""
+        def check(ticket: Ticket):
+            chan = ctx.guild.get_channel(ticket.channel_id)
+            return chan is not None and chan.category_id == category.id
+
+        await self.start_bulk_close(ctx, check, dry_run, reason)
+
+    @bulk.command(name="all")
+    async def bulk_close_all(self, ctx: commands.Context, dry_run: Optional[DryRun] = False, *, reason: str = None):
+        """Close every open ticket"""
+        def check(ticket: Ticket):
+            return True
+
+        await self.start_bulk_close(ctx, check, dry_run, reason)
+
+    @bulk.command(name="cancel")
+    async def bulk_cancel(self, ctx: commands.Context):
+        """Stop the bulk close running in this guild"""
+        task = self.bulk_jobs.pop(ctx.guild.id, None)
+        if not task:
+            return await ctx.send("There is no bulk close running")
+        task.cancel()
+        await self.config.guild(ctx.guild).bulk.set({})
+        await ctx.send("Bulk close has been cancelled")
+
+    async def start_bulk_close(self, ctx: commands.Context, check, dry_run: bool, reason: str):
+        guild = ctx.guild
+        if guild.id in self.bulk_jobs:
+            return await ctx.send("A bulk close is already running, wait for it to finish or cancel it first")
+        tickets = await self.get_tickets(guild)
+        targets = [cid for cid, ticket in tickets.items() if check(ticket)]
+        if not targets:
+            return await ctx.send("No tickets match that")
+
+        if dry_run:
+            text = ""
+            for cid in targets:
+                uid = tickets[cid].owner_id
+                chan = guild.get_channel(cid)
+                member = guild.get_member(uid)
+                chan = chan.mention if chan else f"DeletedChannel-{cid}"
+                member = f"{member.name}-{member.id}" if member else f"LeftGuild-{uid}"
+                text += f"{chan} - {member}\n"
+            embeds = []
+            pages = list(pagify(text, page_length=2000))
+            for i, page in enumerate(pages):
+                embed = discord.Embed(
+                    title=f"{len(targets)} tickets would be closed",
+                    description=page,
+                    color=discord.Colour.dark_theme()
+                )
+                embed.set_footer(text=f"Page {i + 1}/{len(pages)}")
+                embeds.append(embed)
+            return await menu(ctx, embeds, DEFAULT_CONTROLS)
+
+        job = {
+            "targets": targets,
+            "total": len(targets),
+            "failed": 0,
+            "reason": reason,
+            "by": ctx.author.name,
+            "channel": ctx.channel.id,
+            "message": None,
+        }
+        msg = await ctx.send(embed=self.bulk_embed(job))
+        job["message"] = msg.id
+        await self.config.guild(guild).bulk.set(job)
+        self.bulk_jobs[guild.id] = asyncio.create_task(self.run_bulk_close(guild, job))
+
+    async def run_bulk_close(self, guild: discord.Guild, job: dict):
+        conf = await self.config.guild(guild).all()
+        channel = guild.get_channel(job["channel"])
+        progress = channel.get_partial_message(job["message"]) if channel else None
+        sem = asyncio.Semaphore(BULK_CONCURRENCY)
+        # Set when the job stops early so nothing new starts, closes already running are left to finish
+        # since a half done close would leave a channel with no ticket record
+        stopped = asyncio.Event()
+
+        async def close(cid: int):
+            async with sem:
+                if stopped.is_set():
+                    return
+                ticket = await self.get_ticket(guild, cid)
+                if ticket:
+                    try:
+                        owner = guild.get_member(ticket.owner_id)
+                        if not owner:
+                            owner = await self.bot.fetch_user(ticket.owner_id)
+                        await self.close_ticket_channel(
+                            guild, conf, owner, ticket, job["by"], job["reason"], dm=conf["dm"]
+                        )
+                    except Exception as e:
+                        log.warning(f"Bulk close failed for ticket {cid} in {guild.name}: {e}")
+                        job["failed"] += 1
+                job["targets"].remove(cid)
+
+        workers = asyncio.gather(*[close(cid) for cid in list(job["targets"])])
+        try:
+            # Save progress and update the embed on an interval rather than for every ticket
+            while not workers.done():
+                await asyncio.wait([workers], timeout=PROGRESS_INTERVAL)
+                await self.config.guild(guild).bulk.set(job)
+                await self.edit_bulk_progress(progress, job)
+            await self.config.guild(guild).bulk.set({})
+            await self.edit_bulk_progress(progress, job, finished=True)
+            log.info(f"Bulk closed {job['total'] - job['failed']} tickets in {guild.name}")
+        finally:
+            stopped.set()
+            if self.bulk_jobs.get(guild.id) is asyncio.current_task():
+                del self.bulk_jobs[guild.id]
+
+    async def edit_bulk_progress(self, progress: Optional[discord.PartialMessage], job: dict, finished: bool = False):
+        if not progress:
+            return
+        try:
+            await progress.edit(embed=self.bulk_embed(job, finished))
+        except discord.HTTPException:
+            pass
+
+    @staticmethod
+    def bulk_embed(job: dict, finished: bool = False):
+        done = job["total"] - len(job["targets"])
+        embed = discord.Embed(
+            title="Bulk Close Complete" if finished else "Bulk Closing Tickets...",
+            description=f"`Progress: `{done}/{job['total']}\n"
+                        f"`Failed:   `{job['failed']}\n"
+                        f"`Reason:   `{job['reason']}\n",
+            color=discord.Colour.dark_theme()
+        )
+        return embed
+
+    # Pick up any bulk closes that were interrupted by a restart
+    async def resume_bulk_jobs(self):
+        for guild in self.bot.guilds:
+            job = await self.config.guild(guild).bulk()
+            if not job or not job["targets"] or guild.id in self.bulk_jobs:
+                continue
+            log.info(f"Resuming bulk close of {len(job['targets'])} tickets in {guild.name}")
+            self.bulk_jobs[guild.id] = asyncio.create_task(self.run_bulk_close(guild, job))
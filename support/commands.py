@@ -6,6 +6,8 @@ from dislash import ButtonStyle, Button, ActionRow
 from redbot.core import commands
 from redbot.core.utils.chat_formatting import box
 
+from .redact import PRESETS, pattern_error
+
 
 class SupportCommands(commands.Cog):
     @commands.group(name="supportset", aliases=["sset"])
@@ -20,13 +22,16 @@ class SupportCommands(commands.Cog):
         for task in asyncio.all_tasks():
             if guild_id == task.get_name():
                 task.cancel()
+                # add_components skips guilds whose task still exists, so let it finish cancelling first
+                await asyncio.wait([task])
                 await self.add_components()
 
     @support.command(name="view")
     async def view_settings(self, ctx: commands.Context):
         """View support settings"""
         conf = await self.config.guild(ctx.guild).all()
-        category = self.bot.get_channel(conf["category"])
+        resolved = self.get_resolved(ctx.guild, conf)
+        category = resolved.category
         if not category:
             category = conf['category']
         button_channel = self.bot.get_channel(conf['channel_id'])
@@ -46,21 +51,25 @@ class SupportCommands(commands.Cog):
               f"`Users can Manage: `{conf['user_can_manage']}\n" \
               f"`Save Transcripts: `{conf['transcript']}\n" \
               f"`Auto Close:       `{conf['auto_close']}\n" \
+              f"`Auto Overflow:    `{conf['auto_overflow']}\n" \
+              f"`Auto Assign:      `{conf['assign']}\n" \
+              f"`Digest Alerts:    `{conf['digest']} ({conf['digest_window']}s)\n" \
               f"`Ticket Name:      `{conf['ticket_name']}\n"
         log = conf["log"]
         if log:
-            lchannel = ctx.guild.get_channel(log)
+            lchannel = resolved.log_channel
             if lchannel:
                 msg += f"`Log Channel:      `{lchannel.mention}\n"
             else:
                 msg += f"`Log Channel:      `{log}\n"
-        support = conf["support"]
+        pool = ""
+        for cid in self.pool_ids(conf):
+            cat = ctx.guild.get_channel(cid)
+            if isinstance(cat, discord.CategoryChannel):
+                pool += f"{cat.name} ({self.channel_count(cat)}/50)\n"
         suproles = ""
-        if support:
-            for role_id in support:
-                role = ctx.guild.get_role(role_id)
-                if role:
-                    suproles += f"{role.mention}\n"
+        for role in resolved.support_roles:
+            suproles += f"{role.mention}\n"
         blacklist = conf["blacklist"]
         busers = ""
         if blacklist:
@@ -75,6 +84,12 @@ class SupportCommands(commands.Cog):
             description=msg,
             color=discord.Color.random()
         )
+        if pool:
+            embed.add_field(
+                name="Ticket Categories",
+                value=pool,
+                inline=False
+            )
         if suproles:
             embed.add_field(
                 name="Support Roles",
@@ -87,6 +102,13 @@ class SupportCommands(commands.Cog):
                 value=busers,
                 inline=False
             )
+        rules = conf["redact_presets"] + [f"`{p}`" for p in conf["redact"]]
+        if rules:
+            embed.add_field(
+                name="Transcript Redaction",
+                value="\n".join(rules)[:1024],
+                inline=False
+            )
         if conf["message"] != "{default}":
             embed.add_field(
                 name="Ticket Message",
@@ -95,6 +117,46 @@ class SupportCommands(commands.Cog):
             )
         await ctx.send(embed=embed)
 
+    @support.command(name="backend")
+    @commands.is_owner()
+    async def set_backend(self, ctx: commands.Context, backend: str, *, path: str = None):
+        """
+        Set where ticket numbers and open ticket counts are kept
+
+        `memory` - Kept in this process (default)
+        `sqlite` - Kept in an SQLite database so several bot processes on the same machine can share it
+
+        You can optionally give a path for the SQLite database, every process sharing tickets must use the same one
+        """
+        backend = backend.lower()
+        if backend not in ["memory", "sqlite"]:
+            return await ctx.send("Backend must be either memory or sqlite")
+        await self.config.backend.set(backend)
+        await self.config.backend_path.set(path if backend == "sqlite" else None)
+        if self.backend:
+            await self.backend.close()
+            self.backend = None
+        await self.get_backend()
+        await ctx.send(f"Ticket state backend has been set to **{backend}**")
+
+    @support.command(name="retention")
+    @commands.is_owner()
+    async def set_retention(self, ctx: commands.Context, days: int):
+        """
+        Set how many days to keep a guild's support data after the bot leaves it
+
+        If the bot rejoins within that time everything is still there
+        """
+        if days < 1:
+            return await ctx.send("Retention must be at least 1 day")
+        await self.config.retention_days.set(days)
+        await ctx.send(f"Support data for departed guilds will be kept for **{days}** days")
+
+    @support.command(name="analytics")
+    async def view_analytics(self, ctx: commands.Context):
+        """View ticket statistics for this guild"""
+        await ctx.send(embed=await self.analytics_embed(ctx.guild))
+
     @support.command(name="category")
     async def category(self, ctx: commands.Context, category: discord.CategoryChannel):
         """Set the category ticket channels will be created in"""
@@ -103,8 +165,28 @@ class SupportCommands(commands.Cog):
                 "I do not have 'Manage Channels' permissions in that category"
             )
         await self.config.guild(ctx.guild).category.set(category.id)
+        self.invalidate_resolved(ctx.guild.id)
         await ctx.send(f"Tickets will now be created in the {category.name} category")
 
+    @support.command(name="overflow")
+    async def set_overflow_category(self, ctx: commands.Context, category: discord.CategoryChannel):
+        """
+        Add/Remove an overflow category
+
+        Tickets are placed in whichever category has the fewest channels,
+        so overflow categories pick up tickets once the main category starts filling up
+        """
+        async with self.config.guild(ctx.guild).overflow() as overflow:
+            if category.id in overflow:
+                overflow.remove(category.id)
+                return await ctx.send(f"{category.name} has been removed from the overflow categories")
+            if not category.permissions_for(ctx.guild.me).manage_channels:
+                return await ctx.send(
+                    "I do not have 'Manage Channels' permissions in that category"
+                )
+            overflow.append(category.id)
+            await ctx.send(f"{category.name} has been added to the overflow categories")
+
     @support.command(name="supportmessage")
     async def set_support_button_message(self, ctx: commands.Context, message_id: discord.Message):
         """
@@ -161,6 +243,7 @@ class SupportCommands(commands.Cog):
             else:
                 roles.append(role.id)
                 await ctx.send(f"{role.name} has been added to support roles")
+        self.invalidate_resolved(ctx.guild.id)
 
     @support.command(name="blacklist")
     async def set_user_blacklist(self, ctx: commands.Context, *, user: discord.Member):
@@ -177,6 +260,75 @@ class SupportCommands(commands.Cog):
                 bl.append(user.id)
                 await ctx.send(f"{user.name} has been added to the blacklist")
 
+    @support.command(name="oncall")
+    async def set_oncall(self, ctx: commands.Context, *, member: discord.Member):
+        """
+        Add/Remove on-call staff
+
+        On-call staff get a DM summarizing new tickets each digest window while digest alerts are enabled
+        """
+        async with self.config.guild(ctx.guild).oncall() as oncall:
+            if member.id in oncall:
+                oncall.remove(member.id)
+                await ctx.send(f"{member.name} has been removed from on-call staff")
+            else:
+                oncall.append(member.id)
+                await ctx.send(f"{member.name} has been added to on-call staff")
+
+    @support.command(name="digestwindow")
+    async def set_digest_window(self, ctx: commands.Context, seconds: int):
+        """Set how many seconds new ticket alerts are collected for before a digest is posted"""
+        if seconds < 10 or seconds > 3600:
+            return await ctx.send("Digest window must be between 10 and 3600 seconds")
+        await self.config.guild(ctx.guild).digest_window.set(seconds)
+        await ctx.tick()
+
+    @support.command(name="redact")
+    async def set_redact_pattern(self, ctx: commands.Context, *, pattern: str):
+        """
+        Add/Remove a transcript redaction pattern
+
+        Anything in a transcript matching this regex will be replaced with [REDACTED].
+        To remove a pattern, run this command with it again
+        """
+        presets = await self.config.guild(ctx.guild).redact_presets()
+        async with self.config.guild(ctx.guild).redact() as patterns:
+            if pattern in patterns:
+                patterns.remove(pattern)
+                await ctx.send("Redaction pattern has been removed")
+            else:
+                # Rules all end up in one regex, so check it works alongside the others
+                others = [PRESETS[name] for name in presets if name in PRESETS] + patterns
+                error = pattern_error(pattern, others)
+                if error:
+                    return await ctx.send(error)
+                if len(patterns) >= 50:
+                    return await ctx.send("You can only have up to 50 redaction patterns")
+                patterns.append(pattern)
+                await ctx.send("Redaction pattern has been added")
+        self.invalidate_redactor(ctx.guild.id)
+
+    @support.command(name="redactpreset")
+    async def set_redact_preset(self, ctx: commands.Context, preset: str):
+        """
+        (Toggle) A built in transcript redaction preset
+
+        `tokens` - Discord tokens and bearer tokens
+        `emails` - Email addresses
+        `cards` - Card numbers
+        """
+        preset = preset.lower()
+        if preset not in PRESETS:
+            return await ctx.send(f"That is not a valid preset, must be one of {', '.join(PRESETS)}")
+        async with self.config.guild(ctx.guild).redact_presets() as presets:
+            if preset in presets:
+                presets.remove(preset)
+                await ctx.send(f"{preset} will no longer be redacted from transcripts")
+            else:
+                presets.append(preset)
+                await ctx.send(f"{preset} will now be redacted from transcripts")
+        self.invalidate_redactor(ctx.guild.id)
+
     @support.command(name="maxtickets")
     async def set_max_tickets(self, ctx: commands.Context, max_tickets: int):
         """Set the max amount of tickets a user can have opened"""
@@ -187,6 +339,7 @@ class SupportCommands(commands.Cog):
     async def set_log_channel(self, ctx: commands.Context, *, log_channel: discord.TextChannel):
         """Set the log channel"""
         await self.config.guild(ctx.guild).log.set(log_channel.id)
+        self.invalidate_resolved(ctx.guild.id)
         await ctx.tick()
 
     @support.command(name="buttoncontent")
@@ -340,6 +493,54 @@ class SupportCommands(commands.Cog):
             await self.config.guild(ctx.guild).auto_close.set(True)
             await ctx.send("Tickets will now be closed if a user leaves the guild")
 
+    @support.command(name="autooverflow")
+    async def toggle_autooverflow(self, ctx: commands.Context):
+        """
+        (Toggle) Automatic overflow categories
+
+        When every ticket category is full, a new one will be created automatically
+        and deleted again once it has been empty for a while
+        """
+        toggle = await self.config.guild(ctx.guild).auto_overflow()
+        if toggle:
+            await self.config.guild(ctx.guild).auto_overflow.set(False)
+            await ctx.send("Overflow categories will no longer be created automatically")
+        else:
+            await self.config.guild(ctx.guild).auto_overflow.set(True)
+            await ctx.send("Overflow categories will now be created automatically when tickets fill up")
+
+    @support.command(name="assign")
+    async def toggle_assign(self, ctx: commands.Context):
+        """
+        (Toggle) Assign new tickets to support staff
+
+        Each new ticket is assigned to whichever online member of the support roles has the fewest open tickets.
+        The bot needs the presence intent to know who is online.
+        """
+        toggle = await self.config.guild(ctx.guild).assign()
+        if toggle:
+            await self.config.guild(ctx.guild).assign.set(False)
+            await ctx.send("New tickets will no longer be assigned to support staff")
+        else:
+            await self.config.guild(ctx.guild).assign.set(True)
+            await ctx.send("New tickets will now be assigned to the least busy support member")
+
+    @support.command(name="digest")
+    async def toggle_digest(self, ctx: commands.Context):
+        """
+        (Toggle) Digest alerts for new tickets
+
+        Instead of a log message for every ticket, new tickets are collected
+        and posted to the log channel as a single digest message
+        """
+        toggle = await self.config.guild(ctx.guild).digest()
+        if toggle:
+            await self.config.guild(ctx.guild).digest.set(False)
+            await ctx.send("New tickets will be logged individually again")
+        else:
+            await self.config.guild(ctx.guild).digest.set(True)
+            await ctx.send("New tickets will now be logged in digests")
+
     @support.command(name="transcript")
     async def toggle_transcript(self, ctx: commands.Context):
         """
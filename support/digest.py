@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+
+import discord
+from redbot.core import commands
+
+log = logging.getLogger("red.vrt.support.digest")
+
+# Keep editing the same digest message for this long before starting a new one
+DIGEST_REUSE = 600
+# Max characters of ticket lines in a single digest embed
+DIGEST_LIMIT = 2000
+
+
+class DigestMixin(commands.Cog):
+    """
+    Batches ticket opened notifications so the log channel gets at most one write per digest window
+    instead of one embed per ticket
+    """
+
+    def get_digest(self, guild_id: int) -> dict:
+        if guild_id not in self.digests:
+            self.digests[guild_id] = {"pending": [], "task": None, "message": None, "lines": [], "started": 0}
+        return self.digests[guild_id]
+
+    def queue_digest(
+            self,
+            guild: discord.Guild,
+            conf: dict,
+            user: discord.Member,
+            channel: discord.TextChannel,
+            msg: discord.Message,
+            staff: discord.Member = None
+    ):
+        line = f"**[{channel.name}]({msg.jump_url})** - {user.name}-{user.id}"
+        if staff:
+            line += f" (assigned to {staff.name})"
+        digest = self.get_digest(guild.id)
+        digest["pending"].append(line)
+        if not digest["task"]:
+            digest["task"] = asyncio.create_task(self.flush_digest(guild, conf["digest_window"]))
+
+    async def flush_digest(self, guild: discord.Guild, window: int):
+        await asyncio.sleep(window)
+        await self.post_digest(guild)
+
+    async def post_digest(self, guild: discord.Guild):
+        digest = self.get_digest(guild.id)
+        pending, digest["pending"] = digest["pending"], []
+        digest["task"] = None
+        if not pending:
+            return
+        conf = await self.config.guild(guild).all()
+        log_channel = self.get_resolved(guild, conf).log_channel
+        if log_channel:
+            await self.post_digest_message(digest, log_channel, pending)
+        # One summary per window to on-call staff
+        if conf["oncall"]:
+            embed = self.digest_embed(pending, title=f"{len(pending)} New Tickets in {guild.name}")
+            for member_id in conf["oncall"]:
+                member = guild.get_member(member_id)
+                if not member:
+                    continue
+                try:
+                    await member.send(embed=embed)
+                except discord.HTTPException:
+                    pass
+
+    # Edit the last digest if it is recent and has room, otherwise start a new one
+    async def post_digest_message(self, digest: dict, log_channel: discord.TextChannel, pending: list):
+        lines = digest["lines"] + pending
+        message = digest["message"]
+        recent = time.time() - digest["started"] < DIGEST_REUSE
+        if message and recent and len("\n".join(lines)) <= DIGEST_LIMIT:
+            try:
+                await message.edit(embed=self.digest_embed(lines))
+                digest["lines"] = lines
+                return
+            except discord.HTTPException as e:
+                log.warning(f"Failed to edit ticket digest, sending a new one: {e}")
+        try:
+            message = await log_channel.send(embed=self.digest_embed(pending))
+        except discord.HTTPException as e:
+            log.warning(f"Failed to send ticket digest: {e}")
+            return
+        digest.update(message=message, lines=pending, started=time.time())
+
+    @staticmethod
+    def digest_embed(lines: list, title: str = None) -> discord.Embed:
+        text = ""
+        for i, line in enumerate(lines):
+            if len(text) + len(line) > DIGEST_LIMIT:
+                text += f"...and {len(lines) - i} more"
+                break
+            text += f"{line}\n"
+        embed = discord.Embed(
+            title=title if title else "Tickets Opened",
+            description=text,
+            color=discord.Colour.dark_theme()
+        )
+        embed.set_footer(text=f"{len(lines)} tickets")
+        return embed
+
+    # Post anything still waiting instead of dropping it when the cog unloads
+    def flush_all_digests(self):
+        for guild_id, digest in self.digests.items():
+            if not digest["task"]:
+                continue
+            digest["task"].cancel()
+            guild = self.bot.get_guild(guild_id)
+            if guild:
+                asyncio.create_task(self.post_digest(guild))
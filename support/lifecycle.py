@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+
+import discord
+from discord.ext import tasks
+from redbot.core import commands
+
+log = logging.getLogger("red.vrt.support.lifecycle")
+
+# Most dead tickets removed from one guild per compaction run
+COMPACT_BATCH = 50
+# Pause between guilds so compaction never hogs the loop or the config backend
+COMPACT_DELAY = 1
+
+
+class LifecycleMixin(commands.Cog):
+    """Keeps stored data from growing forever as guilds leave and ticket channels disappear"""
+
+    # Drop everything held in memory for a guild
+    async def forget_guild(self, guild_id: int):
+        await self.reset_guild_state(guild_id)
+        self.panels.pop(guild_id, None)
+        self.load.pop(guild_id, None)
+        self.invalidate_redactor(guild_id)
+        digest = self.digests.pop(guild_id, None)
+        if digest and digest["task"]:
+            digest["task"].cancel()
+        job = self.bulk_jobs.pop(guild_id, None)
+        if job:
+            job.cancel()
+
+    @commands.Cog.listener("on_guild_remove")
+    async def lifecycle_guild_remove(self, guild: discord.Guild):
+        await self.forget_guild(guild.id)
+        async with self.config.departed() as departed:
+            departed[str(guild.id)] = int(time.time())
+
+    @commands.Cog.listener("on_guild_join")
+    async def lifecycle_guild_join(self, guild: discord.Guild):
+        async with self.config.departed() as departed:
+            departed.pop(str(guild.id), None)
+
+    # A ticket channel deleted by hand should not hang around in config until the next restart
+    @commands.Cog.listener("on_guild_channel_delete")
+    async def lifecycle_channel_delete(self, channel: discord.abc.GuildChannel):
+        tickets = self.tickets.get(channel.guild.id)
+        if not tickets or channel.id not in tickets:
+            return
+        await self.prune_tickets(channel.guild, [channel.id])
+
+    @tasks.loop(hours=1)
+    async def compactor(self):
+        await self.expire_departed()
+        for guild in list(self.bot.guilds):
+            await self.compact_guild(guild)
+            await asyncio.sleep(COMPACT_DELAY)
+
+    @compactor.before_loop
+    async def before_compactor(self):
+        await self.bot.wait_until_red_ready()
+        # Let startup verification finish first
+        if self.startup_task:
+            await asyncio.wait([self.startup_task])
+        await self.find_departed()
+
+    # Guilds the bot left while it was offline never got an on_guild_remove, so look for them once per load
+    async def find_departed(self):
+        current = {str(guild.id) for guild in self.bot.guilds}
+        stored = await self.config.all_guilds()
+        now = int(time.time())
+        async with self.config.departed() as departed:
+            for guild_id in stored:
+                if str(guild_id) not in current and str(guild_id) not in departed:
+                    departed[str(guild_id)] = now
+
+    # Delete data for guilds that have been gone longer than the retention window, one at a time
+    async def expire_departed(self):
+        days = await self.config.retention_days()
+        cutoff = time.time() - days * 86400
+        departed = await self.config.departed()
+        for guild_id, left in departed.items():
+            if left > cutoff:
+                continue
+            if self.bot.get_guild(int(guild_id)):
+                await self.config.departed.clear_raw(guild_id)
+                continue
+            await self.config.guild_from_id(int(guild_id)).clear()
+            await self.config.departed.clear_raw(guild_id)
+            log.info(f"Cleared support data for guild {guild_id}, it was left more than {days} days ago")
+            await asyncio.sleep(COMPACT_DELAY)
+
+    # Remove a small batch of tickets whose channels no longer exist, plus deleted overflow categories
+    async def compact_guild(self, guild: discord.Guild):
+        tickets = await self.get_tickets(guild)
+        dead = [cid for cid in tickets if not guild.get_channel(cid)][:COMPACT_BATCH]
+        if dead:
+            await self.prune_tickets(guild, dead)
+            log.info(f"Compacted {len(dead)} dead tickets from {guild.name}")
+        await self.prune_overflow(guild)
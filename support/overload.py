@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import discord
+from discord.ext import tasks
+from dislash.interactions.message_interaction import MessageInteraction
+from redbot.core import commands
+
+log = logging.getLogger("red.vrt.support.overload")
+
+# Start shedding load when any of these are crossed
+MAX_INFLIGHT = 10
+MAX_LATENCY = 5.0
+MAX_RATELIMITS = 3
+# Only recover once things are well under the limits again
+RECOVER_INFLIGHT = 3
+# How long 429s count against a guild
+RATELIMIT_WINDOW = 60
+# Minimum time the panel stays disabled
+BUSY_MINUTES = 2
+# Weight of the newest sample in the latency average
+LATENCY_WEIGHT = 0.3
+
+
+class GuildLoad:
+    __slots__ = ("inflight", "latency", "ratelimits", "shedding", "busy_until")
+
+    def __init__(self):
+        self.inflight = 0
+        # Moving average of channel creation time in seconds
+        self.latency = 0.0
+        self.ratelimits = deque()
+        self.shedding = False
+        self.busy_until = 0.0
+
+    def recent_ratelimits(self) -> int:
+        cutoff = time.monotonic() - RATELIMIT_WINDOW
+        while self.ratelimits and self.ratelimits[0] < cutoff:
+            self.ratelimits.popleft()
+        return len(self.ratelimits)
+
+    def overloaded(self) -> bool:
+        return (
+            self.inflight >= MAX_INFLIGHT
+            or self.latency >= MAX_LATENCY
+            or self.recent_ratelimits() >= MAX_RATELIMITS
+        )
+
+    def recovered(self) -> bool:
+        return (
+            time.monotonic() >= self.busy_until
+            and self.inflight <= RECOVER_INFLIGHT
+            and not self.recent_ratelimits()
+        )
+
+
+class RateLimitWatcher(logging.Handler):
+    """
+    discord.py retries 429s itself so they never reach us as errors, but it logs a warning for each one
+    with the route's bucket, which is `channel_id:guild_id:path`. Only works while discord.http logs warnings
+    """
+
+    def __init__(self, callback):
+        super().__init__(logging.WARNING)
+        self.callback = callback
+
+    def emit(self, record: logging.LogRecord):
+        if not str(record.msg).startswith("We are being rate limited"):
+            return
+        if not isinstance(record.args, tuple) or len(record.args) < 2:
+            return
+        parts = str(record.args[1]).split(":")
+        if len(parts) > 1 and parts[1].isdigit():
+            self.callback(int(parts[1]))
+
+
+class OverloadMixin(commands.Cog):
+    """
+    Disables a guild's ticket button while ticket creation is backed up
+    so users get told to come back later instead of clicking into a black hole
+    """
+
+    def get_load(self, guild_id: int) -> GuildLoad:
+        if guild_id not in self.load:
+            self.load[guild_id] = GuildLoad()
+        return self.load[guild_id]
+
+    def is_shedding(self, guild_id: int) -> bool:
+        state = self.load.get(guild_id)
+        return state is not None and state.shedding
+
+    async def reject_busy(self, inter: MessageInteraction, guild_id: int):
+        minutes = max(round((self.get_load(guild_id).busy_until - time.monotonic()) / 60), 1)
+        try:
+            await inter.reply(f"Tickets are busy right now, try again in {minutes} minutes", ephemeral=True)
+        except Exception as e:
+            log.warning(f"Failed to send busy response: {e}")
+
+    # Run a ticket creation while keeping count of how many are in flight
+    async def track_creation(self, guild_id: int, coro):
+        state = self.get_load(guild_id)
+        state.inflight += 1
+        self.check_overload(guild_id)
+        try:
+            await coro
+        except Exception as e:
+            log.exception(f"Failed to create ticket in guild {guild_id}", exc_info=e)
+        finally:
+            state.inflight -= 1
+
+    # Called with the time each ticket channel took to create, including any 429 retries
+    def record_api_call(self, guild_id: int, latency: float):
+        state = self.get_load(guild_id)
+        state.latency = state.latency * (1 - LATENCY_WEIGHT) + latency * LATENCY_WEIGHT
+        self.check_overload(guild_id)
+
+    # Called by the RateLimitWatcher for every 429 on a guild route
+    def record_ratelimit(self, guild_id: int):
+        if guild_id not in self.load:
+            return
+        self.load[guild_id].ratelimits.append(time.monotonic())
+        self.check_overload(guild_id)
+
+    def check_overload(self, guild_id: int):
+        state = self.get_load(guild_id)
+        if state.shedding or not state.overloaded():
+            return
+        state.shedding = True
+        state.busy_until = time.monotonic() + BUSY_MINUTES * 60
+        log.warning(
+            f"Shedding ticket load in guild {guild_id}: {state.inflight} in flight, "
+            f"{round(state.latency, 2)}s latency, {state.recent_ratelimits()} recent 429s"
+        )
+        guild = self.bot.get_guild(guild_id)
+        if guild:
+            asyncio.create_task(self.set_panel_busy(guild))
+
+    async def set_panel_busy(self, guild: discord.Guild):
+        panel = self.panels.get(guild.id)
+        if not panel:
+            return
+        conf = await self.config.guild(guild).all()
+        button = self.panel_button(
+            guild, conf, use_emoji=False, label=f"Busy, try again in {BUSY_MINUTES} minutes", disabled=True
+        )
+        try:
+            await self.set_panel_components(panel, button)
+        except discord.HTTPException as e:
+            log.warning(f"Failed to disable support button in {guild.name}: {e}")
+
+    @tasks.loop(seconds=15)
+    async def overload_monitor(self):
+        for guild_id, state in list(self.load.items()):
+            if not state.shedding or not state.recovered():
+                continue
+            state.shedding = False
+            # Nothing has been created while shedding so the old average means nothing now
+            state.latency = 0.0
+            guild = self.bot.get_guild(guild_id)
+            panel = self.panels.get(guild_id)
+            if not guild or not panel:
+                continue
+            conf = await self.config.guild(guild).all()
+            await self.edit_panel(guild, conf, panel)
+            log.info(f"Support button restored in {guild.name}")
+
+    @overload_monitor.before_loop
+    async def before_overload_monitor(self):
+        await self.bot.wait_until_red_ready()
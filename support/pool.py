@@ -0,0 +1,182 @@
+import asyncio
+import logging
+from typing import Optional
+
+import discord
+from redbot.core import commands
+
+log = logging.getLogger("red.vrt.support.pool")
+
+# Discord will not let a category hold more than 50 channels
+CATEGORY_LIMIT = 50
+# How long an auto-created overflow category has to sit empty before it gets deleted
+RECLAIM_DELAY = 300
+# How long to remember a counted channel while waiting to see it from the other side
+COUNTED_TTL = 60
+
+
+class CategoryPool(commands.Cog):
+    # Primary category first, then admin-listed overflow, then the ones we made ourselves
+    @staticmethod
+    def pool_ids(conf: dict) -> list:
+        ids = []
+        for cid in [conf["category"]] + conf["overflow"] + conf["overflow_created"]:
+            if cid and cid not in ids:
+                ids.append(cid)
+        return ids
+
+    # Channel count for a category, seeded from cache once and then kept up to date by channel events
+    def channel_count(self, category: discord.CategoryChannel) -> int:
+        if category.id not in self.category_counts:
+            self.category_counts[category.id] = len(category.channels)
+        return self.category_counts[category.id]
+
+    # Channels in a category plus the ones being created in it right now
+    def category_load(self, category: discord.CategoryChannel) -> int:
+        return self.channel_count(category) + self.category_reserved.get(category.id, 0)
+
+    def pool_categories(self, guild: discord.Guild, ids: list) -> list:
+        categories = []
+        for cid in ids:
+            category = guild.get_channel(cid)
+            if isinstance(category, discord.CategoryChannel):
+                categories.append(category)
+        return categories
+
+    # Take a slot in the least full category, nothing awaits here so concurrent tickets can't pick the same slot
+    def reserve_category(self, categories: list) -> Optional[discord.CategoryChannel]:
+        if not categories:
+            return None
+        category = min(categories, key=self.category_load)
+        if self.category_load(category) >= CATEGORY_LIMIT:
+            return None
+        self.category_reserved[category.id] = self.category_reserved.get(category.id, 0) + 1
+        return category
+
+    # Give back a slot once the ticket channel has been created and counted, or failed
+    def release_category(self, category_id: int):
+        if self.category_reserved.get(category_id, 0) > 1:
+            self.category_reserved[category_id] -= 1
+        else:
+            self.category_reserved.pop(category_id, None)
+
+    # Ticket channels are seen by both the create call and the create event, in whichever order they arrive
+    # The first one counts the channel and the second one just clears the marker
+    def count_created(self, channel_id: int, category_id: int):
+        if channel_id in self.counted_channels:
+            self.counted_channels.discard(channel_id)
+            return
+        self.counted_channels.add(channel_id)
+        asyncio.get_running_loop().call_later(COUNTED_TTL, self.counted_channels.discard, channel_id)
+        if category_id in self.category_counts:
+            self.category_counts[category_id] += 1
+
+    # Reserve a slot in the least full category in the guild's pool, making a new overflow category if they are all full
+    # Callers must release_category the returned category once they are done with it
+    async def get_ticket_category(self, guild: discord.Guild, conf: dict) -> Optional[discord.CategoryChannel]:
+        categories = self.pool_categories(guild, self.pool_ids(conf))
+        if not categories:
+            return None
+        category = self.reserve_category(categories)
+        if category:
+            return category
+        if not conf["auto_overflow"]:
+            log.warning(f"All ticket categories in {guild.name} are full")
+            return None
+        # One overflow category at a time per guild, everyone else waiting uses the one that got made
+        lock = self.overflow_locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            conf = {**conf, "overflow_created": await self.config.guild(guild).overflow_created()}
+            categories = self.pool_categories(guild, self.pool_ids(conf))
+            category = self.reserve_category(categories)
+            if category:
+                return category
+            category = await self.create_overflow_category(guild, categories)
+            if category:
+                self.category_reserved[category.id] = self.category_reserved.get(category.id, 0) + 1
+            return category
+
+    async def create_overflow_category(self, guild: discord.Guild, categories: list):
+        primary = categories[0]
+        name = f"{primary.name} {len(categories) + 1}"
+        try:
+            category = await guild.create_category(
+                name,
+                overwrites=primary.overwrites,
+                position=categories[-1].position + 1,
+                reason="Support ticket categories are full"
+            )
+        except discord.HTTPException as e:
+            log.warning(f"Failed to create overflow category in {guild.name}: {e}")
+            return None
+        self.category_counts[category.id] = 0
+        async with self.config.guild(guild).overflow_created() as created:
+            created.append(category.id)
+        log.info(f"Created overflow ticket category {name} in {guild.name}")
+        return category
+
+    # Delete an auto-created overflow category if it is still empty after a while
+    async def reclaim_category(self, category: discord.CategoryChannel):
+        await asyncio.sleep(RECLAIM_DELAY)
+        self.reclaiming.pop(category.id, None)
+        if self.category_load(category) or category.channels:
+            return
+        created = await self.config.guild(category.guild).overflow_created()
+        if category.id not in created:
+            return
+        try:
+            await category.delete(reason="Overflow ticket category no longer needed")
+        except discord.HTTPException as e:
+            log.warning(f"Failed to delete empty overflow category {category.name}: {e}")
+            return
+        log.info(f"Reclaimed empty overflow category {category.name} in {category.guild.name}")
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        cid = channel.category_id
+        if cid in self.category_counts:
+            self.count_created(channel.id, cid)
+        task = self.reclaiming.pop(cid, None)
+        if task:
+            task.cancel()
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        if isinstance(channel, discord.CategoryChannel):
+            self.category_counts.pop(channel.id, None)
+            async with self.config.guild(channel.guild).overflow_created() as created:
+                if channel.id in created:
+                    created.remove(channel.id)
+            return
+        cid = channel.category_id
+        if cid not in self.category_counts:
+            return
+        self.category_counts[cid] = max(self.category_counts[cid] - 1, 0)
+        if self.category_counts[cid] or self.category_reserved.get(cid) or cid in self.reclaiming:
+            return
+        created = await self.config.guild(channel.guild).overflow_created()
+        if cid in created and channel.category:
+            self.reclaiming[cid] = asyncio.create_task(self.reclaim_category(channel.category))
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        if before.category_id == after.category_id:
+            return
+        if before.category_id in self.category_counts:
+            self.category_counts[before.category_id] = max(self.category_counts[before.category_id] - 1, 0)
+        if after.category_id in self.category_counts:
+            self.category_counts[after.category_id] += 1
+
+    # Forget deleted overflow categories and reclaim ones that were made but never used,
+    # those never see a channel delete so nothing else would schedule them
+    async def prune_overflow(self, guild: discord.Guild):
+        created = await self.config.guild(guild).overflow_created()
+        alive = [cid for cid in created if guild.get_channel(cid)]
+        if len(alive) != len(created):
+            await self.config.guild(guild).overflow_created.set(alive)
+        for cid in alive:
+            category = guild.get_channel(cid)
+            if not isinstance(category, discord.CategoryChannel) or cid in self.reclaiming:
+                continue
+            if not self.category_load(category) and not category.channels:
+                self.reclaiming[cid] = asyncio.create_task(self.reclaim_category(category))
@@ -0,0 +1,146 @@
+import asyncio
+import datetime
+import logging
+from typing import Dict, List, Optional
+
+import discord
+from redbot.core import commands
+
+log = logging.getLogger("red.vrt.support.records")
+
+
+class Ticket:
+    """
+    Open ticket record
+
+    Stored in config as `opened[owner_id][channel_id] = [opened, logmsg, replied, assigned]`
+    where opened is a unix timestamp, logmsg is 0 if there is no log message,
+    replied is 1 once support staff have sent a message in the ticket
+    and assigned is the ID of the support member the ticket is assigned to, or 0
+    """
+    __slots__ = ("owner_id", "channel_id", "opened", "logmsg", "replied", "assigned")
+
+    def __init__(
+            self,
+            owner_id: int,
+            channel_id: int,
+            opened: int,
+            logmsg: int = 0,
+            replied: int = 0,
+            assigned: int = 0
+    ):
+        self.owner_id = owner_id
+        self.channel_id = channel_id
+        self.opened = opened
+        self.logmsg = logmsg
+        self.replied = replied
+        self.assigned = assigned
+
+    @property
+    def opened_at(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.opened).astimezone()
+
+    def to_config(self) -> list:
+        return [self.opened, self.logmsg, self.replied, self.assigned]
+
+    @classmethod
+    def from_config(cls, owner_id: str, channel_id: str, data) -> "Ticket":
+        # Tickets saved before 1.4.0 were dicts of strings
+        if isinstance(data, dict):
+            opened = int(datetime.datetime.fromisoformat(data["opened"]).timestamp())
+            logmsg = int(data["logmsg"]) if data.get("logmsg") else 0
+            return cls(int(owner_id), int(channel_id), opened, logmsg)
+        return cls(int(owner_id), int(channel_id), *data)
+
+
+class TicketRecords(commands.Cog):
+    # Held while the index is loaded and while a ticket is added or removed,
+    # so a reload can't miss a write that lands while it is reading config
+    def ticket_lock(self, guild_id: int) -> asyncio.Lock:
+        if guild_id not in self.ticket_locks:
+            self.ticket_locks[guild_id] = asyncio.Lock()
+        return self.ticket_locks[guild_id]
+
+    # Open tickets for a guild keyed by channel ID, loaded from config once
+    async def get_tickets(self, guild: discord.Guild) -> Dict[int, Ticket]:
+        tickets = self.tickets.get(guild.id)
+        if tickets is not None:
+            return tickets
+        return await self.load_tickets(guild)
+
+    # Build the index from config and swap it in, replacing anything already loaded
+    async def load_tickets(self, guild: discord.Guild) -> Dict[int, Ticket]:
+        async with self.ticket_lock(guild.id):
+            opened = await self.config.guild(guild).opened()
+            tickets = {}
+            legacy = False
+            for uid, channels in opened.items():
+                for cid, data in channels.items():
+                    if isinstance(data, dict):
+                        legacy = True
+                    ticket = Ticket.from_config(uid, cid, data)
+                    tickets[ticket.channel_id] = ticket
+            self.tickets[guild.id] = tickets
+            if legacy:
+                await self.save_tickets(guild)
+                log.info(f"Converted {len(tickets)} tickets in {guild.name} to the compact format")
+        await self.sync_open_counts(guild)
+        return tickets
+
+    async def get_ticket(self, guild: discord.Guild, channel_id: int) -> Optional[Ticket]:
+        tickets = await self.get_tickets(guild)
+        return tickets.get(channel_id)
+
+    async def get_user_tickets(self, guild: discord.Guild, user_id: int) -> List[Ticket]:
+        tickets = await self.get_tickets(guild)
+        return [t for t in tickets.values() if t.owner_id == user_id]
+
+    async def add_ticket(self, guild: discord.Guild, ticket: Ticket):
+        await self.get_tickets(guild)
+        async with self.ticket_lock(guild.id):
+            # Look the index up again, it may have been swapped out while waiting
+            tickets = self.tickets.get(guild.id)
+            if tickets is not None:
+                tickets[ticket.channel_id] = ticket
+            await self.config.guild(guild).opened.set_raw(
+                str(ticket.owner_id), str(ticket.channel_id), value=ticket.to_config()
+            )
+
+    async def update_ticket(self, guild: discord.Guild, ticket: Ticket):
+        async with self.ticket_lock(guild.id):
+            # Don't write a ticket that got closed in the meantime back into config
+            if ticket.channel_id not in self.tickets.get(guild.id, {}):
+                return
+            await self.config.guild(guild).opened.set_raw(
+                str(ticket.owner_id), str(ticket.channel_id), value=ticket.to_config()
+            )
+
+    async def remove_ticket(self, guild: discord.Guild, channel_id: int) -> Optional[Ticket]:
+        await self.get_tickets(guild)
+        async with self.ticket_lock(guild.id):
+            tickets = self.tickets.get(guild.id, {})
+            ticket = tickets.pop(channel_id, None)
+            if not ticket:
+                return None
+            owner_id = str(ticket.owner_id)
+            if any(t.owner_id == ticket.owner_id for t in tickets.values()):
+                await self.config.guild(guild).opened.clear_raw(owner_id, str(channel_id))
+            else:
+                await self.config.guild(guild).opened.clear_raw(owner_id)
+        return ticket
+
+    # Drop tickets that are gone without going through a close, giving back their open slots
+    async def prune_tickets(self, guild: discord.Guild, channel_ids: List[int]):
+        backend = await self.get_backend()
+        for cid in channel_ids:
+            ticket = await self.remove_ticket(guild, cid)
+            if ticket:
+                await backend.release(guild.id, ticket.owner_id)
+                await self.unassign_ticket(guild, ticket)
+
+    # Write the whole index back to config
+    async def save_tickets(self, guild: discord.Guild):
+        opened = {}
+        for ticket in self.tickets.get(guild.id, {}).values():
+            opened.setdefault(str(ticket.owner_id), {})[str(ticket.channel_id)] = ticket.to_config()
+        await self.config.guild(guild).opened.set(opened)
@@ -0,0 +1,97 @@
+import logging
+import re
+from typing import List, Optional, Pattern
+
+import discord
+from redbot.core import commands
+
+log = logging.getLogger("red.vrt.support.redact")
+
+REDACTED = "[REDACTED]"
+# Built in patterns admins can switch on without writing regex
+PRESETS = {
+    "tokens": r"[MNO][\w-]{23,27}\.[\w-]{6}\.[\w-]{27,38}|[Bb]earer\s+[\w\-.~+/]+=*",
+    # Only start at the beginning of an address, otherwise a long run of word characters gets retried from every position
+    "emails": r"(?<![\w.+-])[\w.+-]+@[\w-]+(?:\.[\w-]+)+",
+    "cards": r"\b(?:\d[ -]?){12,18}\d\b",
+}
+
+
+# Rule features that change meaning once rules are joined into one regex,
+# inline flags like (?i) would apply to every rule and numbered groups get renumbered
+GLOBAL_FLAGS = re.compile(r"(?<!\\)(?:\\\\)*\(\?[aiLmsux]+\)")
+NUMBERED_REFS = re.compile(r"(?<!\\)(?:\\\\)*(?:\\[1-9]|\(\?\([1-9])")
+
+
+def shareable(pattern: str) -> bool:
+    return not GLOBAL_FLAGS.search(pattern) and not NUMBERED_REFS.search(pattern)
+
+
+def combine(patterns: list) -> Pattern:
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+
+
+def pattern_error(pattern: str, others: list) -> Optional[str]:
+    """Why a new rule can't be added alongside the guild's other rules, if it can't"""
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        return f"That is not a valid regex pattern: {e}"
+    if GLOBAL_FLAGS.search(pattern):
+        return "Inline flags like `(?i)` would apply to every rule, scope them instead like `(?i:secret)`"
+    if NUMBERED_REFS.search(pattern):
+        return "Numbered backreferences are not supported, use a named group and `(?P=name)` instead"
+    try:
+        combine([p for p in others if shareable(p)] + [pattern])
+    except re.error as e:
+        return f"That pattern does not work alongside the existing ones: {e}"
+    return None
+
+
+def build_redactor(patterns: list) -> Optional[List[Pattern]]:
+    """
+    Combine rules into one alternation so each message only gets scanned once
+
+    Rules that can't share a regex get their own, and if the combined regex still
+    fails to compile every rule is checked on its own instead
+    """
+    shared = []
+    alone = []
+    for pattern in patterns:
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            log.warning(f"Skipping bad redaction pattern {pattern}: {e}")
+            continue
+        if shareable(pattern):
+            shared.append(pattern)
+        else:
+            alone.append(compiled)
+    if shared:
+        try:
+            alone.insert(0, combine(shared))
+        except re.error as e:
+            log.warning(f"Redaction patterns could not be combined, using them one at a time: {e}")
+            alone = [re.compile(pattern) for pattern in shared] + alone
+    return alone or None
+
+
+class RedactMixin(commands.Cog):
+    async def get_redactor(self, guild: discord.Guild, conf: dict) -> Optional[List[Pattern]]:
+        if guild.id in self.redactors:
+            return self.redactors[guild.id]
+        patterns = [PRESETS[name] for name in conf["redact_presets"] if name in PRESETS]
+        redactor = build_redactor(patterns + conf["redact"])
+        self.redactors[guild.id] = redactor
+        return redactor
+
+    def invalidate_redactor(self, guild_id: int):
+        self.redactors.pop(guild_id, None)
+
+    @staticmethod
+    def redact(redactor: Optional[List[Pattern]], text: str) -> str:
+        if not redactor:
+            return text
+        for pattern in redactor:
+            text = pattern.sub(REDACTED, text)
+        return text
@@ -0,0 +1,78 @@
+import logging
+
+import discord
+from redbot.core import commands
+
+log = logging.getLogger("red.vrt.support.resolved")
+
+CAN_READ = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+READ_AND_MANAGE = discord.PermissionOverwrite(
+    read_messages=True, send_messages=True, manage_channels=True, manage_permissions=True
+)
+NO_READ = discord.PermissionOverwrite(read_messages=False)
+
+
+class ResolvedSettings:
+    """Guild settings resolved to their discord objects"""
+    __slots__ = ("support_roles", "overwrites", "log_channel", "category")
+
+    def __init__(self, guild: discord.Guild, conf: dict):
+        self.support_roles = []
+        for role_id in conf["support"]:
+            role = guild.get_role(role_id)
+            if role:
+                self.support_roles.append(role)
+        # Overwrite template for new tickets, the ticket owner gets added to a copy of this
+        self.overwrites = {
+            guild.default_role: NO_READ,
+            guild.me: READ_AND_MANAGE
+        }
+        for role in self.support_roles:
+            self.overwrites[role] = CAN_READ
+        self.log_channel = guild.get_channel(conf["log"]) if conf["log"] else None
+        self.category = guild.get_channel(conf["category"]) if conf["category"] else None
+
+    def ticket_overwrites(self, user: discord.Member) -> dict:
+        overwrite = self.overwrites.copy()
+        overwrite[user] = CAN_READ
+        return overwrite
+
+
+class ResolvedCache(commands.Cog):
+    def get_resolved(self, guild: discord.Guild, conf: dict) -> ResolvedSettings:
+        resolved = self.resolved.get(guild.id)
+        if not resolved:
+            resolved = ResolvedSettings(guild, conf)
+            self.resolved[guild.id] = resolved
+        return resolved
+
+    def invalidate_resolved(self, guild_id: int):
+        self.resolved.pop(guild_id, None)
+
+    @commands.Cog.listener("on_guild_role_update")
+    async def resolved_role_update(self, before: discord.Role, after: discord.Role):
+        resolved = self.resolved.get(after.guild.id)
+        if resolved and (after in resolved.support_roles or after.is_default()):
+            self.invalidate_resolved(after.guild.id)
+
+    @commands.Cog.listener("on_guild_role_delete")
+    async def resolved_role_delete(self, role: discord.Role):
+        resolved = self.resolved.get(role.guild.id)
+        if resolved and role in resolved.support_roles:
+            self.invalidate_resolved(role.guild.id)
+
+    @commands.Cog.listener("on_guild_channel_update")
+    async def resolved_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        resolved = self.resolved.get(after.guild.id)
+        if resolved and after in [resolved.log_channel, resolved.category]:
+            self.invalidate_resolved(after.guild.id)
+
+    @commands.Cog.listener("on_guild_channel_delete")
+    async def resolved_channel_delete(self, channel: discord.abc.GuildChannel):
+        resolved = self.resolved.get(channel.guild.id)
+        if resolved and channel in [resolved.log_channel, resolved.category]:
+            self.invalidate_resolved(channel.guild.id)
+
+    @commands.Cog.listener("on_guild_update")
+    async def resolved_guild_update(self, before: discord.Guild, after: discord.Guild):
+        self.invalidate_resolved(after.id)
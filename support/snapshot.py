@@ -0,0 +1,126 @@
+import json
+import logging
+import time
+
+import discord
+from redbot.core import commands
+from redbot.core.data_manager import cog_data_path
+
+from .records import Ticket
+from .resolved import ResolvedSettings
+
+log = logging.getLogger("red.vrt.support.snapshot")
+
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotMixin(commands.Cog):
+    """
+    Derived state is written to disk when the cog unloads so the next load can get panels
+    working straight away, then check everything against config in the background
+    """
+
+    @property
+    def snapshot_path(self):
+        return cog_data_path(self) / "snapshot.json"
+
+    # Called from cog_unload so this has to be sync
+    def write_snapshot(self):
+        guilds = {}
+        for guild in self.bot.guilds:
+            data = {}
+            tickets = self.tickets.get(guild.id)
+            if tickets is not None:
+                data["tickets"] = [
+                    [t.owner_id, t.channel_id, t.opened, t.logmsg, t.replied, t.assigned] for t in tickets.values()
+                ]
+            panel = self.panels.get(guild.id)
+            if panel:
+                data["panel"] = [panel.channel.id, panel.id]
+            resolved = self.resolved.get(guild.id)
+            if resolved:
+                data["resolved"] = {
+                    "support": [role.id for role in resolved.support_roles],
+                    "log": resolved.log_channel.id if resolved.log_channel else None,
+                    "category": resolved.category.id if resolved.category else None
+                }
+            if data:
+                guilds[str(guild.id)] = data
+        snapshot = {"version": SNAPSHOT_VERSION, "written": int(time.time()), "guilds": guilds}
+        try:
+            with open(self.snapshot_path, "w") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+        except OSError as e:
+            log.warning(f"Failed to write state snapshot: {e}")
+
+    # Load the snapshot from the last unload, it gets deleted so a crash can't restore stale state later
+    def restore_snapshot(self) -> int:
+        path = self.snapshot_path
+        if not path.exists():
+            return 0
+        try:
+            with open(path, "r") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"Failed to read state snapshot: {e}")
+            return 0
+        finally:
+            path.unlink(missing_ok=True)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            return 0
+        restored = 0
+        for guild_id, data in snapshot["guilds"].items():
+            guild = self.bot.get_guild(int(guild_id))
+            if not guild:
+                continue
+            if "tickets" in data:
+                self.tickets[guild.id] = {t[1]: Ticket(*t) for t in data["tickets"]}
+            if "panel" in data:
+                channel = guild.get_channel(data["panel"][0])
+                if channel:
+                    self.panels[guild.id] = channel.get_partial_message(data["panel"][1])
+            if "resolved" in data:
+                self.resolved[guild.id] = ResolvedSettings(guild, data["resolved"])
+            restored += 1
+        return restored
+
+    # Replace snapshot state with what is actually in config, one guild at a time
+    async def verify_state(self):
+        start = time.monotonic()
+        await self.cleanup(reload=True)
+        self.startup_stats["verified"] = time.monotonic() - self.load_started
+        log.info(f"Support state verified in {round(time.monotonic() - start, 2)}s")
+        await self.resume_bulk_jobs()
+
+    # Called whenever a panel listener starts, only the first one after load counts
+    def panel_armed(self):
+        if "panels_live" in self.startup_stats:
+            return
+        elapsed = time.monotonic() - self.load_started
+        self.startup_stats["panels_live"] = elapsed
+        log.info(
+            f"First support panel live {round(elapsed, 2)}s after load "
+            f"({self.startup_stats.get('restored', 0)} guilds restored from snapshot)"
+        )
+
+    def startup_report(self) -> str:
+        stats = self.startup_stats
+        text = f"`Restored Guilds:  `{stats.get('restored', 0)}\n"
+        if "panels_live" in stats:
+            text += f"`First Panel Live: `{round(stats['panels_live'], 2)}s\n"
+        if "verified" in stats:
+            text += f"`State Verified:   `{round(stats['verified'], 2)}s\n"
+        else:
+            text += "`State Verified:   `Still running\n"
+        return text
+
+    @commands.command(name="supportstartup")
+    @commands.is_owner()
+    async def view_startup(self, ctx: commands.Context):
+        """View how long the support cog took to get panels working after it loaded"""
+        embed = discord.Embed(
+            title="Support Startup",
+            description=self.startup_report(),
+            color=discord.Colour.dark_theme()
+        )
+        await ctx.send(embed=embed)
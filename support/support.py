@@ -2,7 +2,8 @@ import asyncio
 import datetime
 import logging
 import os
-from io import StringIO
+import time
+from typing import Optional
 
 import discord
 from discord.ext import tasks
@@ -14,8 +15,21 @@ from dislash import (ActionRow,
 from dislash.interactions.message_interaction import MessageInteraction
 from redbot.core import commands, Config
 
+from .analytics import AnalyticsMixin
+from .assign import AssignMixin
+from .backend import BackendMixin
 from .base import BaseCommands
+from .digest import DigestMixin
+from .bulk import BulkCommands
 from .commands import SupportCommands
+from .lifecycle import LifecycleMixin
+from .overload import OverloadMixin, RateLimitWatcher
+from .pool import CategoryPool
+from .records import Ticket, TicketRecords
+from .redact import RedactMixin
+from .resolved import ResolvedCache, ResolvedSettings
+from .snapshot import SnapshotMixin
+from .transfer import TransferCommands
 
 log = logging.getLogger("red.vrt.support")
 
@@ -23,12 +37,29 @@ log = logging.getLogger("red.vrt.support")
 # Shoutout to Neuro Assassin#4779 for having a nice ass support ticket cog I could get ideas from
 
 
-class Support(BaseCommands, SupportCommands, commands.Cog):
+class Support(
+    BaseCommands,
+    BulkCommands,
+    SupportCommands,
+    CategoryPool,
+    ResolvedCache,
+    TicketRecords,
+    BackendMixin,
+    SnapshotMixin,
+    AnalyticsMixin,
+    AssignMixin,
+    DigestMixin,
+    TransferCommands,
+    RedactMixin,
+    OverloadMixin,
+    LifecycleMixin,
+    commands.Cog
+):
     """
     Support ticket system with buttons/logging
     """
     __author__ = "Vertyco"
-    __version__ = "1.1.3"
+    __version__ = "1.13.0"
 
     def format_help_for_context(self, ctx):
         helpcmd = super().format_help_for_context(ctx)
@@ -44,6 +75,10 @@ class Support(BaseCommands, SupportCommands, commands.Cog):
         default_guild = {
             # Ticket category
             "category": None,
+            # Overflow categories for when the main one fills up
+            "overflow": [],
+            "overflow_created": [],
+            "auto_overflow": False,
             # Support button message data
             "message_id": None,
             "channel_id": None,
@@ -59,6 +94,10 @@ class Support(BaseCommands, SupportCommands, commands.Cog):
             # Ticket data
             "opened": {},
             "num": 0,
+            # In-progress bulk close
+            "bulk": {},
+            # Ticket analytics
+            "stats": {},
             # Content
             "button_content": "Click To Open A Ticket!",
             "emoji": None,
@@ -71,14 +110,84 @@ class Support(BaseCommands, SupportCommands, commands.Cog):
             "user_can_manage": False,
             "transcript": False,
             "auto_close": False,
+            "assign": False,
+            "digest": False,
+            # Notification digest settings
+            "digest_window": 60,
+            "oncall": [],
+            # Transcript redaction rules
+            "redact": [],
+            "redact_presets": [],
         }
         self.config.register_guild(**default_guild)
+        self.default_guild = default_guild
+        self.config.register_global(
+            # Where shared ticket state lives, memory or sqlite
+            backend="memory",
+            backend_path=None,
+            # Guild ID to when the bot left it, data is cleared once retention_days have passed
+            departed={},
+            retention_days=30
+        )
+        self.load_started = time.monotonic()
+        self.startup_stats = {}
+        self.startup_task = None
+        # Live channel counts for ticket categories
+        self.category_counts = {}
+        # Slots taken by ticket channels that are still being created
+        self.category_reserved = {}
+        # Ticket channels counted before their create event arrived
+        self.counted_channels = set()
+        self.overflow_locks = {}
+        self.reclaiming = {}
+        # Guild settings resolved to discord objects
+        self.resolved = {}
+        # Open tickets keyed by guild ID then channel ID
+        self.tickets = {}
+        self.ticket_locks = {}
+        # Ticket number and open count state
+        self.backend = None
+        self.backend_lock = asyncio.Lock()
+        # Ticket analytics aggregates
+        self.stats = {}
+        # Support staff ordered by assigned ticket count
+        self.staff_queues = {}
+        # Pending ticket notification digests
+        self.digests = {}
+        # Compiled transcript redaction patterns
+        self.redactors = {}
+        # Ticket creation load per guild
+        self.load = {}
+        self.ratelimit_watcher = RateLimitWatcher(self.record_ratelimit)
+        logging.getLogger("discord.http").addHandler(self.ratelimit_watcher)
+        # Support message handles
+        self.panels = {}
+        # (channel_id, message_id) of support messages known to be deleted
+        self.dead_panels = set()
+        # Running bulk close tasks
+        self.bulk_jobs = {}
         self.check_listener.start()
+        self.overload_monitor.start()
+        self.compactor.start()
         # Dislash monkeypatch
         self.inter_client = InteractionClient(bot)
 
     def cog_unload(self):
         self.check_listener.cancel()
+        self.overload_monitor.cancel()
+        self.compactor.cancel()
+        logging.getLogger("discord.http").removeHandler(self.ratelimit_watcher)
+        if self.startup_task:
+            self.startup_task.cancel()
+        self.write_snapshot()
+        for task in self.reclaiming.values():
+            task.cancel()
+        # Bulk closes save their progress and resume on next load
+        for task in self.bulk_jobs.values():
+            task.cancel()
+        if self.backend:
+            asyncio.create_task(self.backend.close())
+        self.flush_all_digests()
         # Cancel all guild tasks
         # Hope nobody else is using asyncio task names!
         # Tasks are named guild.id for each guild so if you are plz DM me and ill make a diff naming scheme
@@ -94,11 +203,17 @@ class Support(BaseCommands, SupportCommands, commands.Cog):
     @check_listener.before_loop
     async def before_listener(self):
         await self.bot.wait_until_red_ready()
-        await self.cleanup()
+        # Get panels working from the snapshot first, then check everything against config in the background
+        self.startup_stats["restored"] = self.restore_snapshot()
+        self.startup_task = asyncio.create_task(self.verify_state())
 
     # Add button components to support message and determine if a listener task needs to be created
     async def add_components(self):
+        running = [task.get_name() for task in asyncio.all_tasks()]
         for guild in self.bot.guilds:
+            # Check if listener task is running for guild
+            if str(guild.id) in running:
+                continue
             conf = await self.config.guild(guild).all()
             if not conf["category"]:
                 continue
@@ -106,139 +221,203 @@ class Support(BaseCommands, SupportCommands, commands.Cog):
                 continue
             if not conf["channel_id"]:
                 continue
-            channel = self.bot.get_channel(conf["channel_id"])
-            if not channel:
+            # Don't keep hitting a deleted message, wait for a new one to be set
+            if (conf["channel_id"], conf["message_id"]) in self.dead_panels:
                 continue
-            message = await channel.fetch_message(conf["message_id"])
-            if not message:
+            panel = self.get_panel(guild, conf)
+            if not panel:
                 continue
-            bcolor = conf["bcolor"]
-            if bcolor == "red":
-                style = ButtonStyle.red
-            elif bcolor == "blue":
-                style = ButtonStyle.blurple
-            elif bcolor == "green":
-                style = ButtonStyle.green
-            else:
-                style = ButtonStyle.grey
+            # Keep the busy button up, the overload monitor puts the normal one back once things recover
+            if self.is_shedding(guild.id):
+                await self.set_panel_busy(guild)
+            elif not await self.edit_panel(guild, conf, panel):
+                continue
+            asyncio.create_task(self.listen(panel), name=str(guild.id))
+            self.panel_armed()
 
-            # Check if listener task is running for guild
-            guild_id = str(guild.id)
-            running = [task.get_name() for task in asyncio.all_tasks()]
-            if guild_id not in running:
-                button_content = conf["button_content"]
-                emoji = conf["emoji"]
-                if emoji:
-                    button = ActionRow(
-                        Button(
-                            style=style,
-                            label=button_content,
-                            custom_id=f"{guild.id}",
-                            emoji=emoji
-                        )
-                    )
-                else:
-                    button = ActionRow(
-                        Button(
-                            style=style,
-                            label=button_content,
-                            custom_id=f"{guild.id}"
-                        )
-                    )
-                try:
-                    await message.edit(components=[button])
-                except Exception as e:
-                    if "Invalid emoji" in str(e):
-                        log.warning(f"Button emoji in {guild.name} is bad")
-                        button = ActionRow(
-                            Button(
-                                style=style,
-                                label=button_content,
-                                custom_id=f"{guild.id}"
-                            )
-                        )
-                        await message.edit(components=[button])
-                    else:
-                        button = ActionRow(
-                            Button(
-                                style=style,
-                                label="Click to open a ticket",
-                                custom_id=f"{guild.id}"
-                            )
-                        )
-                        await message.edit(components=[button])
-                        log.warning(f"Error applying button: {e}")
-                asyncio.create_task(self.listen(message), name=str(guild.id))
+    # Get the cached handle for a guild's support message, no API calls needed
+    def get_panel(self, guild: discord.Guild, conf: dict) -> Optional[discord.PartialMessage]:
+        panel = self.panels.get(guild.id)
+        if panel and panel.id == conf["message_id"] and panel.channel.id == conf["channel_id"]:
+            return panel
+        channel = guild.get_channel(conf["channel_id"])
+        if not channel:
+            return None
+        panel = channel.get_partial_message(conf["message_id"])
+        self.panels[guild.id] = panel
+        return panel
+
+    @staticmethod
+    def panel_button(
+            guild: discord.Guild,
+            conf: dict,
+            use_emoji: bool = True,
+            label: str = None,
+            disabled: bool = False
+    ) -> ActionRow:
+        bcolor = conf["bcolor"]
+        if bcolor == "red":
+            style = ButtonStyle.red
+        elif bcolor == "blue":
+            style = ButtonStyle.blurple
+        elif bcolor == "green":
+            style = ButtonStyle.green
+        else:
+            style = ButtonStyle.grey
+        button_content = label if label else conf["button_content"]
+        emoji = conf["emoji"]
+        if emoji and use_emoji:
+            return ActionRow(
+                Button(
+                    style=style,
+                    label=button_content,
+                    custom_id=f"{guild.id}",
+                    emoji=emoji,
+                    disabled=disabled
+                )
+            )
+        return ActionRow(
+            Button(
+                style=style,
+                label=button_content,
+                custom_id=f"{guild.id}",
+                disabled=disabled
+            )
+        )
+
+    async def set_panel_components(self, panel: discord.PartialMessage, button: ActionRow):
+        await self.bot.http.edit_message(panel.channel.id, panel.id, components=[button.to_dict()])
+
+    # Apply the button to the support message, only fetching the message if the edit fails
+    async def edit_panel(self, guild: discord.Guild, conf: dict, panel: discord.PartialMessage) -> bool:
+        try:
+            await self.set_panel_components(panel, self.panel_button(guild, conf))
+            return True
+        except discord.NotFound:
+            log.warning(f"Support message in {guild.name} no longer exists")
+            self.panels.pop(guild.id, None)
+            self.dead_panels.add((panel.channel.id, panel.id))
+            return False
+        except discord.HTTPException as e:
+            error = e
+        try:
+            await panel.fetch()
+        except discord.NotFound:
+            log.warning(f"Support message in {guild.name} no longer exists")
+            self.panels.pop(guild.id, None)
+            self.dead_panels.add((panel.channel.id, panel.id))
+            return False
+        except discord.HTTPException as e:
+            log.warning(f"Failed to fetch support message in {guild.name}: {e}")
+            return False
+        if "Invalid emoji" in str(error):
+            log.warning(f"Button emoji in {guild.name} is bad")
+            button = self.panel_button(guild, conf, use_emoji=False)
+        else:
+            log.warning(f"Error applying button: {error}")
+            button = self.panel_button(guild, conf, use_emoji=False, label="Click to open a ticket")
+        try:
+            await self.set_panel_components(panel, button)
+        except discord.HTTPException as e:
+            log.warning(f"Failed to apply fallback button in {guild.name}: {e}")
+            return False
+        return True
+
+    # Drop the panel handle and stop listening if a support message gets deleted
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        self.panel_deleted(payload.guild_id, [payload.message_id])
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        self.panel_deleted(payload.guild_id, payload.message_ids)
+
+    def panel_deleted(self, guild_id: Optional[int], message_ids):
+        panel = self.panels.get(guild_id)
+        if not panel or panel.id not in message_ids:
+            return
+        del self.panels[guild_id]
+        self.dead_panels.add((panel.channel.id, panel.id))
+        for task in asyncio.all_tasks():
+            if task.get_name() == str(guild_id):
+                task.cancel()
+        log.info(f"Support message in guild {guild_id} was deleted")
 
     # Clean up any ticket data that comes from a deleted channel or unknown user
-    async def cleanup(self):
+    async def cleanup(self, reload: bool = False):
         for guild in self.bot.guilds:
-            t = await self.config.guild(guild).opened()
-            current_tickets = {}
-            count = 0
-            for uid, tickets in t.items():
-                if not guild.get_member(int(uid)):
-                    count += 1
-                    continue
-                new_tickets = {}
-                for cid, data in tickets.items():
-                    if not guild.get_channel(int(cid)):
-                        count += 1
-                        continue
-                    else:
-                        new_tickets[cid] = data
-                if new_tickets:
-                    current_tickets[uid] = new_tickets
-            await self.config.guild(guild).opened.set(current_tickets)
-            if count:
-                log.info(f"{count} tickets pruned from {guild.name}")
+            if reload:
+                # Replace anything restored from the snapshot with a fresh load from config
+                await self.load_tickets(guild)
+                self.staff_queues.pop(guild.id, None)
+                self.invalidate_resolved(guild.id)
+            tickets = await self.get_tickets(guild)
+            dead = [
+                cid for cid, ticket in tickets.items()
+                if not guild.get_member(ticket.owner_id) or not guild.get_channel(cid)
+            ]
+            if dead:
+                await self.prune_tickets(guild, dead)
+                log.info(f"{len(dead)} tickets pruned from {guild.name}")
+            await asyncio.sleep(0)
 
     # Listen for a button click on a message
-    async def listen(self, message: discord.Message):
-        if isinstance(message, str):  # If for some reason message is not a discord.Message object
-            #  Edit: Pretty sure i found the issue
-            log.warning(f"Message isn't an object for some reason: {message}")
-            return await self.add_components()
-        inter = await message.wait_for_button_click()
-        try:
-            await inter.reply(type=ResponseType.DeferredUpdateMessage)
-        except Exception as e:
-            log.warning(f"Listener Error: {e}")
-        return await self.create_ticket(inter, message)
+    async def listen(self, message: discord.PartialMessage):
+        def check(i: MessageInteraction):
+            return i.message is not None and i.message.id == message.id
+
+        # Tickets are created in their own tasks so a slow one doesn't hold up the next click
+        while True:
+            inter = await self.inter_client.wait_for_button_click(check)
+            guild_id = int(inter.clicked_button.id)
+            if self.is_shedding(guild_id):
+                asyncio.create_task(self.reject_busy(inter, guild_id))
+                continue
+            try:
+                await inter.reply(type=ResponseType.DeferredUpdateMessage)
+            except Exception as e:
+                log.warning(f"Listener Error: {e}")
+            asyncio.create_task(self.track_creation(guild_id, self.create_ticket(inter)))
 
     # Create a ticket channel for the user
-    async def create_ticket(self, inter: MessageInteraction, message: discord.Message):
+    async def create_ticket(self, inter: MessageInteraction):
         button_guild = inter.clicked_button.id
         guild = self.bot.get_guild(int(button_guild))
         if not guild:
-            return await self.listen(message)
+            return
         user = inter.author
-        pfp = user.avatar_url
         conf = await self.config.guild(guild).all()
-        if str(inter.author.id) in conf["opened"]:
-            tickets = len(conf["opened"][str(inter.author.id)].keys())
-            if tickets >= conf["max_tickets"]:
-                return await self.listen(message)
-        category = self.bot.get_channel(conf["category"])
-        if not category:
+        resolved = self.get_resolved(guild, conf)
+        if not resolved.category:
             asyncio.create_task(inter.reply("The ticket category hasn't been set yet!", ephemeral=True))
-            return await self.listen(message)
-        can_read = discord.PermissionOverwrite(read_messages=True, send_messages=True)
-        read_and_manage = discord.PermissionOverwrite(
-            read_messages=True, send_messages=True, manage_channels=True, manage_permissions=True
-        )
-        support = [
-            guild.get_role(role_id) for role_id in conf["support"] if guild.get_role(role_id)
-        ]
-        overwrite = {
-            guild.default_role: discord.PermissionOverwrite(read_messages=False),
-            guild.me: read_and_manage,
-            user: can_read
-        }
-        for role in support:
-            overwrite[role] = can_read
-        num = conf["num"]
+            return
+        # Loading the guild's tickets makes sure the backend has its open counts
+        await self.get_tickets(guild)
+        backend = await self.get_backend()
+        if not await backend.try_open(guild.id, user.id, conf["max_tickets"]):
+            return
+        num = await backend.next_number(guild.id, conf["num"])
+        ticket = None
+        try:
+            ticket = await self.open_ticket(inter, guild, conf, resolved, num)
+        finally:
+            # Anything that stops the ticket reaching config gives the slot back
+            if not ticket:
+                await backend.release(guild.id, user.id)
+        if ticket:
+            await self.record_open(guild, ticket)
 
+    # Create the ticket channel, send the welcome message and save the ticket, returns None if it couldn't be made
+    async def open_ticket(
+            self,
+            inter: MessageInteraction,
+            guild: discord.Guild,
+            conf: dict,
+            resolved: ResolvedSettings,
+            num: int
+    ) -> Optional[Ticket]:
+        user = inter.author
+        overwrite = resolved.ticket_overwrites(user)
         now = datetime.datetime.now()
         name_fmt = conf["ticket_name"]
         if name_fmt == "{default}":
@@ -253,7 +432,24 @@ class Support(BaseCommands, SupportCommands, commands.Cog):
                 "time": now.strftime("%I-%M-%p")
             }
             channel_name = name_fmt.format(**params)
-        channel = await category.create_text_channel(channel_name, overwrites=overwrite)
+        # Reserves a slot in the category until the channel is created and counted
+        category = await self.get_ticket_category(guild, conf)
+        if not category:
+            asyncio.create_task(inter.reply("All ticket categories are full, try again later!", ephemeral=True))
+            return None
+        start = time.monotonic()
+        try:
+            channel = await category.create_text_channel(channel_name, overwrites=overwrite)
+            # Count it now, the create event can arrive after this returns
+            self.count_created(channel.id, category.id)
+        except discord.HTTPException as e:
+            self.record_api_call(guild.id, time.monotonic() - start)
+            log.warning(f"Failed to create ticket channel in {guild.name}: {e}")
+            asyncio.create_task(inter.reply("Failed to create your ticket, try again later!", ephemeral=True))
+            return None
+        finally:
+            self.release_category(category.id)
+        self.record_api_call(guild.id, time.monotonic() - start)
         # Ticket message setup
         embeds = conf["embeds"]
         color = user.color
@@ -303,29 +499,36 @@ class Support(BaseCommands, SupportCommands, commands.Cog):
                     else:
                         msg = await channel.send(f"{user.mention}, {text}")
 
-        async with self.config.guild(guild).all() as settings:
-            settings["num"] += 1
-            opened = settings["opened"]
-            if str(user.id) not in opened:
-                opened[str(user.id)] = {}
-            opened[str(user.id)][str(channel.id)] = {
-                "opened": now.isoformat(),
-                "pfp": str(pfp),
-                "logmsg": None
-            }
-            if conf["log"]:
-                log_channel = self.bot.get_channel(conf["log"])
-                if log_channel:
-                    embed = discord.Embed(
-                        title="Ticket Opened",
-                        description=f"Ticket created by **{user.name}-{user.id}** has been opened\n"
-                                    f"To view this ticket, **[Click Here]({msg.jump_url})**",
-                        color=discord.Colour.dark_theme()
-                    )
-                    embed.set_thumbnail(url=pfp)
-                    log_msg = await log_channel.send(embed=embed)
-                    opened[str(user.id)][str(channel.id)]["logmsg"] = str(log_msg.id)
-        return await self.listen(message)
+        # Tickets are created concurrently, so never let a slower one move the stored number backwards
+        num_value = self.config.guild(guild).num
+        async with num_value.get_lock():
+            if num + 1 > await num_value():
+                await num_value.set(num + 1)
+        ticket = Ticket(user.id, channel.id, int(now.timestamp()))
+        staff = None
+        if conf["assign"]:
+            staff = await self.pick_staff(guild, resolved.support_roles)
+            if staff:
+                await self.assign_ticket(guild, ticket, staff)
+                await channel.send(f"{staff.mention} has been assigned to this ticket")
+        log_channel = resolved.log_channel
+        if conf["digest"]:
+            self.queue_digest(guild, conf, user, channel, msg, staff)
+        elif log_channel:
+            desc = f"Ticket created by **{user.name}-{user.id}** has been opened\n" \
+                   f"To view this ticket, **[Click Here]({msg.jump_url})**"
+            if staff:
+                desc += f"\nAssigned to **{staff.name}**"
+            embed = discord.Embed(
+                title="Ticket Opened",
+                description=desc,
+                color=discord.Colour.dark_theme()
+            )
+            embed.set_thumbnail(url=user.avatar_url)
+            log_msg = await log_channel.send(embed=embed)
+            ticket.logmsg = log_msg.id
+        await self.add_ticket(guild, ticket)
+        return ticket
 
     # Will automatically close/cleanup any tickets if a member leaves that has an open ticket
     @commands.Cog.listener()
@@ -335,76 +538,13 @@ class Support(BaseCommands, SupportCommands, commands.Cog):
         conf = await self.config.guild(member.guild).all()
         if not conf["auto_close"]:
             return
-        opened = conf["opened"]
-        if str(member.id) not in opened:
-            return
-        tickets = opened[str(member.id)]
-        if not tickets:
-            return
-        now = datetime.datetime.now()
-        for cid, ticket in tickets.items():
-            # Gather data
-            pfp = ticket["pfp"]
-            opened = ticket["opened"]
-            opened = datetime.datetime.fromisoformat(opened)
-            opened = opened.strftime('%m/%d/%y at %I:%M %p')
-            closed = now.strftime('%m/%d/%y at %I:%M %p')
-            embed = discord.Embed(
-                title="Ticket Closed",
-                description=f"Ticket created by **{member.name}-{member.id}** has been closed.\n"
-                            f"`Opened on: `{opened}\n"
-                            f"`Closed on: `{closed}\n"
-                            f"`Closed by: `{self.bot.user.name}\n"
-                            f"`Reason:    `User left guild(Auto-Close)\n",
-                color=discord.Colour.dark_theme()
+        tickets = await self.get_user_tickets(member.guild, member.id)
+        for ticket in tickets:
+            await self.close_ticket_channel(
+                member.guild,
+                conf,
+                member,
+                ticket,
+                self.bot.user.name,
+                "User left guild(Auto-Close)"
             )
-            embed.set_thumbnail(url=pfp)
-            chan = self.bot.get_channel(int(cid))
-            if conf["log"]:
-                log_chan = self.bot.get_channel(conf["log"])
-            else:
-                log_chan = None
-            # Send off log
-            if conf["transcript"]:
-                if chan:
-                    history = await self.fetch_channel_history(chan)
-                    history.reverse()
-                    filename = f"{member.name}-{member.id}.txt"
-                    filename = filename.replace("/", "")
-                    if log_chan:
-                        text = ""
-                        for msg in history:
-                            if msg.author.id == self.bot.user.id:
-                                continue
-                            if not msg:
-                                continue
-                            if not msg.content:
-                                continue
-                            text += f"{msg.author.name}: {msg.content}\n"
-                        iofile = StringIO(text)
-                        file = discord.File(iofile, filename=filename)
-                        await log_chan.send(embed=embed, file=file)
-            else:
-                if log_chan:
-                    await log_chan.send(embed=embed)
-            # Delete old log msg
-            if log_chan:
-                log_msg_id = ticket["logmsg"]
-                try:
-                    log_msg = await log_chan.fetch_message(log_msg_id)
-                except discord.NotFound:
-                    log.warning("Failed to get log channel message")
-                    log_msg = None
-                if log_msg:
-                    try:
-                        await log_msg.delete()
-                    except Exception as e:
-                        log.warning(f"Failed to auto-delete log message: {e}")
-            # Delete ticket channel
-            try:
-                await chan.delete()
-            except Exception as e:
-                log.warning(f"Failed to auto-delete ticket channel: {e}")
-        async with self.config.guild(member.guild).opened() as tickets:
-            if str(member.id) in tickets:
-                del tickets[str(member.id)]
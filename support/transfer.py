@@ -0,0 +1,323 @@
+import asyncio
+import gzip
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Optional
+
+import discord
+from redbot.core import commands
+from redbot.core.data_manager import cog_data_path
+
+from .analytics import stats_error
+
+log = logging.getLogger("red.vrt.support.transfer")
+
+EXPORT_VERSION = 1
+# Lines written or read per trip to the executor
+LINE_BATCH = 500
+# Tickets written to config at a time during import
+IMPORT_BATCH = 500
+# Settings that only mean something to the running bot and are never exported
+SKIPPED_KEYS = ["opened", "bulk"]
+# Settings that default to None and what they hold once set
+NULLABLE_TYPES = {
+    "category": int,
+    "message_id": int,
+    "channel_id": int,
+    "log": int,
+    "content": str,
+    "emoji": str,
+}
+# What each list setting holds
+LIST_TYPES = {
+    "overflow": int,
+    "overflow_created": int,
+    "support": int,
+    "blacklist": int,
+    "oncall": int,
+    "redact": str,
+    "redact_presets": str,
+}
+
+
+def setting_error(key: str, value, default) -> Optional[str]:
+    """Check an imported setting against the type of its default"""
+    if default is None:
+        if value is None:
+            return None
+        expected = NULLABLE_TYPES.get(key, int)
+    else:
+        expected = type(default)
+    # bool is a subclass of int, so don't let one pass for the other
+    if isinstance(value, bool) != (expected is bool) or not isinstance(value, expected):
+        return f"Setting {key} should be {expected.__name__}, not {type(value).__name__}"
+    if key == "stats":
+        return stats_error(value)
+    if key in LIST_TYPES:
+        item_type = LIST_TYPES[key]
+        if not all(isinstance(i, item_type) and not isinstance(i, bool) for i in value):
+            return f"Setting {key} should only hold {item_type.__name__} values"
+    return None
+
+
+class TransferError(Exception):
+    pass
+
+
+class LineWriter:
+    """Buffers JSON lines and writes them to a gzip file off the event loop"""
+
+    def __init__(self, path: Path):
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+        self.buffer = []
+
+    async def write(self, record: dict):
+        self.buffer.append(json.dumps(record, separators=(",", ":")))
+        if len(self.buffer) >= LINE_BATCH:
+            await self.flush()
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        text = "\n".join(self.buffer) + "\n"
+        self.buffer = []
+        await asyncio.get_running_loop().run_in_executor(None, self.file.write, text)
+
+    async def close(self):
+        await self.flush()
+        await asyncio.get_running_loop().run_in_executor(None, self.file.close)
+
+
+async def read_records(path: Path):
+    """Yield records from a gzip JSONL file a batch of lines at a time"""
+    loop = asyncio.get_running_loop()
+    file = await loop.run_in_executor(None, gzip.open, path, "rt", 9, "utf-8")
+
+    def read_batch():
+        lines = []
+        for line in file:
+            lines.append(line)
+            if len(lines) >= LINE_BATCH:
+                break
+        return lines
+
+    try:
+        line_num = 0
+        while True:
+            lines = await loop.run_in_executor(None, read_batch)
+            if not lines:
+                break
+            for line in lines:
+                line_num += 1
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    raise TransferError(f"Line {line_num} is not valid JSON")
+    except (OSError, EOFError) as e:
+        raise TransferError(f"Unable to read file: {e}")
+    finally:
+        file.close()
+
+
+class TransferCommands(commands.Cog):
+    @property
+    def export_path(self) -> Path:
+        path = cog_data_path(self) / "exports"
+        path.mkdir(exist_ok=True)
+        return path
+
+    @commands.command(name="supportexport")
+    @commands.is_owner()
+    async def export_support(self, ctx: commands.Context, guild_id: Optional[int] = None):
+        """
+        Export support settings and open tickets
+
+        Exports one guild by ID, or every guild the bot is in if no ID is given.
+        The export is a compressed JSON lines file that can be loaded with `supportimport`
+        """
+        if guild_id:
+            guild = self.bot.get_guild(guild_id)
+            if not guild:
+                return await ctx.send("I am not in a guild with that ID")
+            guilds = [guild]
+        else:
+            guilds = self.bot.guilds
+        name = f"support-{guild_id if guild_id else 'all'}-{int(time.time())}.jsonl.gz"
+        path = self.export_path / name
+        async with ctx.typing():
+            guild_count, ticket_count = await self.write_export(path, guilds)
+        text = f"Exported {guild_count} guilds and {ticket_count} tickets"
+        limit = ctx.guild.filesize_limit if ctx.guild else 8388608
+        if path.stat().st_size <= limit:
+            await ctx.send(text, file=discord.File(str(path), filename=name))
+        else:
+            await ctx.send(f"{text}\nThe file is too big to upload, it has been saved to `{path}`")
+
+    async def write_export(self, path: Path, guilds: list):
+        writer = LineWriter(path)
+        guild_count = 0
+        ticket_count = 0
+        try:
+            await writer.write({
+                "type": "header",
+                "version": EXPORT_VERSION,
+                "cog_version": self.__version__,
+                "created": int(time.time())
+            })
+            # One guild in memory at a time
+            for guild in guilds:
+                conf = await self.config.guild(guild).all()
+                if not conf["category"] and not conf["opened"]:
+                    continue
+                settings = {k: v for k, v in conf.items() if k not in SKIPPED_KEYS}
+                await writer.write({"type": "guild", "guild": guild.id, "settings": settings})
+                guild_count += 1
+                for ticket in (await self.get_tickets(guild)).values():
+                    await writer.write({
+                        "type": "ticket",
+                        "guild": guild.id,
+                        "owner": ticket.owner_id,
+                        "channel": ticket.channel_id,
+                        "data": ticket.to_config()
+                    })
+                    ticket_count += 1
+                await asyncio.sleep(0)
+            await writer.write({"type": "end", "guilds": guild_count, "tickets": ticket_count})
+        finally:
+            await writer.close()
+        return guild_count, ticket_count
+
+    @commands.command(name="supportimport")
+    @commands.is_owner()
+    async def import_support(self, ctx: commands.Context, *, path: str = None):
+        """
+        Import support settings and tickets from a `supportexport` file
+
+        Attach the file to the command, or give the path to a file on the bot's machine.
+        Settings in the file replace the current settings of each guild in it,
+        and tickets are merged into the guild's open tickets
+        """
+        if path:
+            file_path = Path(path)
+            if not file_path.exists():
+                return await ctx.send("That file does not exist")
+        elif ctx.message.attachments:
+            attachment = ctx.message.attachments[0]
+            file_path = self.export_path / f"import-{int(time.time())}.jsonl.gz"
+            await attachment.save(str(file_path))
+        else:
+            return await ctx.send("Attach an export file or give the path to one")
+        async with ctx.typing():
+            try:
+                # Check the whole file before touching anything
+                await self.import_file(file_path, apply=False)
+                guild_count, ticket_count = await self.import_file(file_path, apply=True)
+            except TransferError as e:
+                return await ctx.send(f"Import failed: {e}")
+        await ctx.send(f"Imported {guild_count} guilds and {ticket_count} tickets")
+
+    def validate_record(self, record: dict):
+        if not isinstance(record, dict):
+            raise TransferError("Record is not an object")
+        kind = record.get("type")
+        if kind == "guild":
+            if not isinstance(record.get("guild"), int) or not isinstance(record.get("settings"), dict):
+                raise TransferError("Guild record is malformed")
+            for key, value in record["settings"].items():
+                if key not in self.default_guild or key in SKIPPED_KEYS:
+                    continue
+                error = setting_error(key, value, self.default_guild[key])
+                if error:
+                    raise TransferError(f"Guild {record['guild']}: {error}")
+        elif kind == "ticket":
+            ids = [record.get("guild"), record.get("owner"), record.get("channel")]
+            if not all(isinstance(i, int) for i in ids):
+                raise TransferError("Ticket record has bad IDs")
+            data = record.get("data")
+            if not isinstance(data, list) or not 2 <= len(data) <= 4 or not all(isinstance(i, int) for i in data):
+                raise TransferError("Ticket record data is malformed")
+        elif kind == "end":
+            if not isinstance(record.get("guilds"), int) or not isinstance(record.get("tickets"), int):
+                raise TransferError("End record is malformed")
+        else:
+            raise TransferError(f"Unknown record type {kind}")
+
+    async def import_file(self, path: Path, apply: bool):
+        guild_count = 0
+        ticket_count = 0
+        header = False
+        end = None
+        pending = {}
+        async for record in read_records(path):
+            if not header:
+                if not isinstance(record, dict) or record.get("type") != "header":
+                    raise TransferError("File does not start with an export header")
+                if record.get("version") != EXPORT_VERSION:
+                    raise TransferError(f"Unsupported export version {record.get('version')}")
+                header = True
+                continue
+            if end:
+                raise TransferError("File has records after its end marker")
+            self.validate_record(record)
+            kind = record["type"]
+            if kind == "end":
+                end = record
+            elif kind == "guild":
+                guild_count += 1
+                if apply:
+                    await self.import_settings(record["guild"], record["settings"])
+            elif kind == "ticket":
+                ticket_count += 1
+                if apply:
+                    batch = pending.setdefault(record["guild"], {})
+                    batch.setdefault(str(record["owner"]), {})[str(record["channel"])] = record["data"]
+                    if ticket_count % IMPORT_BATCH == 0:
+                        await self.import_tickets(pending)
+                        pending = {}
+        if not header:
+            raise TransferError("File is empty")
+        # An export that failed partway still closes cleanly, the end marker is how we know it finished
+        if not end:
+            raise TransferError("File has no end marker, the export may not have finished")
+        if end["guilds"] != guild_count or end["tickets"] != ticket_count:
+            raise TransferError(
+                f"File says it has {end['guilds']} guilds and {end['tickets']} tickets "
+                f"but {guild_count} guilds and {ticket_count} tickets were found"
+            )
+        if apply:
+            await self.import_tickets(pending)
+        return guild_count, ticket_count
+
+    async def import_settings(self, guild_id: int, settings: dict):
+        settings = {k: v for k, v in settings.items() if k in self.default_guild and k not in SKIPPED_KEYS}
+        async with self.config.guild_from_id(guild_id).all() as conf:
+            conf.update(settings)
+        await self.reset_guild_state(guild_id)
+
+    async def import_tickets(self, pending: dict):
+        for guild_id, tickets in pending.items():
+            # Only touch the owners in this batch rather than rewriting the guild's whole ticket map
+            opened = self.config.guild_from_id(guild_id).opened
+            for owner_id, channels in tickets.items():
+                existing = await opened.get_raw(owner_id, default={})
+                existing.update(channels)
+                await opened.set_raw(owner_id, value=existing)
+            await self.reset_guild_state(guild_id)
+            await asyncio.sleep(0)
+
+    # Drop everything derived from a guild's config so it gets rebuilt from the imported data
+    async def reset_guild_state(self, guild_id: int):
+        # The ticket number sequence gets seeded again from the imported number
+        if self.backend:
+            await self.backend.reset_number(guild_id)
+        self.tickets.pop(guild_id, None)
+        self.staff_queues.pop(guild_id, None)
+        self.stats.pop(guild_id, None)
+        self.invalidate_resolved(guild_id)
+        for task in asyncio.all_tasks():
+            if task.get_name() == str(guild_id):
+                task.cancel()